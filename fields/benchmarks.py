@@ -0,0 +1,177 @@
+import random
+import sys
+import time
+from multiprocessing import cpu_count
+from timeit import timeit
+
+from blocks import Nodes, Elements, Beam_loads
+from datasets import Node, Shaped_section, Beam_load
+from fields import Id_list
+from utils import grouping_continuous_int
+
+DATASET_SAMPLES = (
+    (Node, "1, 1.0, 2.0, 3.0"),
+    (
+        Shaped_section,
+        "1, DBUSER, P 318.5x12.7, CC, 0, 0, 0, 0, 0, 0, YES, NO, P, 2, "
+        "318.5, 12.7, 0, 0, 0, 0, 0, 0, 0, 0"
+    ),
+    (
+        Beam_load,
+        "1 3to9by2, BEAM, UNILOAD, GZ, NO, NO, aDir[1], , , , "
+        "0, -10, 1, -10, 0, 0, 0, 0, , NO, 0, 0, NO"
+    )
+)
+
+ID_SAMPLES = (
+    ("continuous", list(range(1, 1000001))),
+    ("stride 3", list(range(1, 3000001, 3))),
+    ("grid 100x10000", [x * 100 + y for x in range(10000) for y in range(1, 101, 3)]),
+    ("random half", sorted(random.Random(0).sample(range(1, 2000001), 1000000)))
+)
+
+
+BLOCK_SAMPLES = (
+    (Nodes, ["{}, {}.0, 2.0, 3.0".format(i, i) for i in range(1, 200001)]),
+    (Elements, ["{}, BEAM, 1, 1, {}, {}, 0, 0".format(i, i, i + 1) for i in range(1, 200001)]),
+    (
+        Beam_loads,
+        [
+            "{}, BEAM, UNILOAD, GZ, NO, NO, aDir[1], , , , "
+            "0, -10, 1, -10, 0, 0, 0, 0, , NO, 0, 0, NO".format(i) for i in range(1, 50001)
+        ]
+    )
+)
+
+
+def generic_from_line(dataset_type, line):
+    dataset = dataset_type.__new__(dataset_type)
+    params = dataset._apply_datatype(line.split(","))
+    dataset._dataset = dataset_type.dataset_class(*params)
+    return dataset
+
+
+def generic_to_line(dataset):
+    return ", ".join(map(str, dataset._dataset))
+
+
+def bench_dataset(dataset_type, line, number=50000):
+    dataset = dataset_type.from_line(line)
+    if generic_to_line(dataset) != dataset.to_line():
+        raise ValueError("Not match generic and specialized line.")
+    timings = (
+        timeit(lambda: generic_from_line(dataset_type, line), number=number),
+        timeit(lambda: dataset_type.from_line(line), number=number),
+        timeit(lambda: generic_to_line(dataset), number=number),
+        timeit(lambda: dataset.to_line(), number=number)
+    )
+    return tuple([x / number * 1e6 for x in timings])
+
+
+def bench_passthrough(dataset_type, line, number=10000):
+    formatted = dataset_type.from_line(line)
+    verbatim = dataset_type.from_line(line, keep_source=True)
+    if verbatim.to_line() != line:
+        raise ValueError("Not match source and verbatim line.")
+    return tuple([
+        timeit(x.to_line, number=number) / number * 1e6 for x in (formatted, verbatim)
+    ])
+
+
+def bench_parallel_parse(block_class, lines, processes):
+    start = time.time()
+    serial = block_class.from_lines(lines)
+    serial_time = time.time() - start
+    start = time.time()
+    parallel = block_class.from_lines(lines, processes=processes)
+    parse_time = time.time() - start
+    len(parallel.items)
+    build_time = time.time() - start
+    if serial.to_lines() != parallel.to_lines():
+        raise ValueError("Not match serial and parallel parse.")
+    return serial_time, parse_time, build_time
+
+
+def deep_sizeof(obj, seen=None):
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum([deep_sizeof(x, seen) for x in obj.keys()])
+        size += sum([deep_sizeof(x, seen) for x in obj.values()])
+    elif isinstance(obj, (tuple, list, set)):
+        size += sum([deep_sizeof(x, seen) for x in obj])
+    if not isinstance(obj, tuple) and hasattr(obj, "__dict__"):
+        size += deep_sizeof(obj.__dict__, seen)
+    slots = getattr(type(obj), "__slots__", ())
+    for slot in (slots,) if isinstance(slots, str) else slots:
+        if hasattr(obj, slot):
+            size += deep_sizeof(getattr(obj, slot), seen)
+    return size
+
+
+def bench_record_memory(dataset_type, line):
+    return (
+        deep_sizeof(dataset_type.from_line(line)),
+        deep_sizeof(dataset_type.record_from_line(line))
+    )
+
+
+def unit_step_expression(ids):
+    return " ".join([
+        str(x[0]) if len(x) == 1 else "{}to{}".format(x[0], x[-1])
+        for x in grouping_continuous_int(ids)
+    ])
+
+
+def bench_id_encoding(ids, number=3):
+    expression = str(Id_list(ids))
+    return (
+        timeit(lambda: unit_step_expression(ids), number=number) / number,
+        timeit(lambda: str(Id_list(ids)), number=number) / number,
+        len(unit_step_expression(ids)),
+        len(expression)
+    )
+
+
+if __name__ == "__main__":
+    print(
+        "dataset, generic parse[us], parse[us], generic format[us], format[us], "
+        "parse speedup, format speedup"
+    )
+    for dataset_type, line in DATASET_SAMPLES:
+        timings = bench_dataset(dataset_type, line)
+        speedups = (timings[0] / timings[1], timings[2] / timings[3])
+        print("{}, {:.2f}, {:.2f}, {:.2f}, {:.2f}, {:.2f}, {:.2f}".format(
+            dataset_type.__name__, *(timings + speedups)
+        ))
+
+    processes = max(2, cpu_count())
+    print("block, processes, serial[s], parallel[s], parallel with build[s], speedup")
+    for block_class, lines in BLOCK_SAMPLES:
+        timings = bench_parallel_parse(block_class, lines, processes)
+        print("{}, {}, {:.3f}, {:.3f}, {:.3f}, {:.2f}".format(
+            block_class.key, processes, *(timings + (timings[0] / timings[2],))
+        ))
+
+    print("dataset, format[us], verbatim[us]")
+    for dataset_type, line in DATASET_SAMPLES:
+        print("{}, {:.2f}, {:.2f}".format(
+            dataset_type.__name__, *bench_passthrough(dataset_type, line)
+        ))
+
+    print("dataset, dataset[bytes], record[bytes], ratio")
+    for dataset_type, line in DATASET_SAMPLES:
+        dataset_size, record_size = bench_record_memory(dataset_type, line)
+        print("{}, {}, {}, {:.2f}".format(
+            dataset_type.__name__,
+            dataset_size,
+            record_size,
+            float(dataset_size) / record_size
+        ))
+
+    print("ids, unit step[s], runs[s], unit step[chars], runs[chars]")
+    for name, ids in ID_SAMPLES:
+        print("{}, {:.3f}, {:.3f}, {}, {}".format(name, *bench_id_encoding(ids)))
@@ -1,3 +1,7 @@
+from collections import OrderedDict
+from itertools import chain, islice
+from multiprocessing import Pool
+
 from utils import grouping_values_by_index
 from fields import Keyword
 from datasets import (
@@ -27,12 +31,62 @@ from datasets import (
 )
 from fields import Element_type, Positive_integer
 
+CHUNKS_PER_PROCESS = 4
+WRITE_CHUNK_LINES = 4096
+
+
+def parse_chunk(args):
+    block_class, records = args
+    return [block_class.decode_item(x) for x in records]
+
+
+class Decoded_items(object):
+    def __init__(self, decoded, records=None, compact=False):
+        self.decoded = decoded
+        self.records = records
+        self.compact = compact
+
+    def __len__(self):
+        return len(self.decoded)
+
+    def build(self):
+        if self.compact:
+            return [tuple.__new__(t.record_class, x) for t, x in self.decoded]
+        items = [t.from_decoded(x) for t, x in self.decoded]
+        if self.records is not None:
+            for item, record in zip(items, self.records):
+                item.attach_source(record)
+        return items
+
+
+def write_lines(fileobj, lines, chunk_size=WRITE_CHUNK_LINES):
+    lines = iter(lines)
+    chunk = list(islice(lines, chunk_size))
+    while chunk:
+        fileobj.write("\n".join(chunk) + "\n")
+        chunk = list(islice(lines, chunk_size))
+
+
 class Block_base(object):
     item_type = None
     key = ""
+    is_load = False
+    parallel = False
+    verbatim = True
+    source_header = None
+    trailer = ()
 
     def __init__(self, items):
-        self.items = self._constructor(items)
+        if isinstance(items, Decoded_items):
+            self._decoded = items
+        else:
+            self.items = self._constructor(items)
+
+    def __getattr__(self, name):
+        if name == "items" and "_decoded" in self.__dict__:
+            self.items = self._constructor(self.__dict__.pop("_decoded").build())
+            return self.items
+        raise AttributeError(name)
 
     def __repr__(self):
         return "<{}:{}items>".format(self.key, len(self.items))
@@ -56,10 +110,42 @@ class Block_base(object):
 
     @property
     def header(self):
-        return ["*" + self.key]
+        return [self.source_header or "*" + self.key]
+
+    def iter_lines(self):
+        return chain(self.header, (x.to_line() for x in self.items))
 
     def to_lines(self):
-        return self.header + [x.to_line() for x in self.items]
+        return list(self.iter_lines())
+
+    def write_to(self, fileobj, chunk_size=WRITE_CHUNK_LINES):
+        write_lines(fileobj, chain(self.iter_lines(), self.trailer), chunk_size)
+
+    @classmethod
+    def parse_item(cls, record, compact=False, keep_source=False):
+        if compact:
+            return cls.item_type.record_from_line(record)
+        return cls.item_type.from_line(record, keep_source)
+
+    @classmethod
+    def decode_item(cls, record):
+        return cls.item_type, tuple(cls.item_type.record_from_line(record))
+
+    @classmethod
+    def parse_items(cls, records, processes=None, compact=False, keep_source=False):
+        if not processes or processes < 2:
+            return [cls.parse_item(x, compact, keep_source) for x in records]
+        size = len(records) // (processes * CHUNKS_PER_PROCESS) + 1
+        chunks = [records[i:i + size] for i in range(0, len(records), size)]
+        pool = Pool(processes)
+        try:
+            decoded = pool.map(parse_chunk, [(cls, x) for x in chunks])
+        finally:
+            pool.close()
+            pool.join()
+        return Decoded_items(
+            list(chain.from_iterable(decoded)), records if keep_source else None, compact
+        )
 
     @classmethod
     def from_lines(cls, lines):
@@ -73,13 +159,13 @@ class Fixed_length_block(Block_base):
         return items
 
     @classmethod
-    def from_lines(cls, lines):
+    def from_lines(cls, lines, processes=None, compact=False, keep_source=False):
         if cls.line_num == 1:
-            items = [cls.item_type.from_line(x) for x in lines]
+            items = cls.parse_items(lines, processes, compact, keep_source)
             return cls(items)
         elif cls.line_num >= 2:
             grouped = grouping_values_by_index(lines, lambda x: x // cls.line_num)
-            items = [cls.item_type.from_line(x) for x in grouped]
+            items = cls.parse_items(grouped, processes, compact, keep_source)
             return cls(items)
         raise ValueError
 
@@ -95,14 +181,21 @@ class Singleline_block(Fixed_length_block):
 
 class Mapping_block(Block_base):
     def _constructor(self, items):
-        return {x.id: x for x in items}
+        return OrderedDict((int(x.id), x) for x in items)
 
-    def to_lines(self):
-        return self.header + [x.to_line() for x in self.items.values()]
+    def __add__(self, other):
+        if isinstance(other, self.__class__):
+            return self.__class__(
+                list(self.items.values()) + list(other.items.values())
+            )
+        raise ValueError("Not match class.")
+
+    def iter_lines(self):
+        return chain(self.header, (x.to_line() for x in self.items.values()))
 
     @classmethod
-    def from_lines(cls, lines):
-        items = [cls.item_type.from_line(x) for x in lines]
+    def from_lines(cls, lines, processes=None, compact=False, keep_source=False):
+        items = cls.parse_items(lines, processes, compact, keep_source)
         return cls(items)
 
 
@@ -112,29 +205,69 @@ class Multitype_block(Block_base):
     key_type = None
 
     @classmethod
-    def from_lines(cls, lines):
-        items = [
-            cls.create_instance_by_key(
-                cls.key_type(cls.extract_key(x)), x
-            ) for x in lines
-        ]
+    def parse_item(cls, record, compact=False, keep_source=False):
+        if compact:
+            raise NotImplementedError("This block cannot hold compact records.")
+        item = cls.create_instance_by_key(
+            cls.key_type(cls.extract_key(record)), record
+        )
+        return item.attach_source(record) if keep_source else item
+
+    @classmethod
+    def decode_item(cls, record):
+        item_type = cls.item_type_by_key(cls.key_type(cls.extract_key(record)))
+        return item_type, tuple(item_type.record_from_line(record))
+
+    @classmethod
+    def from_lines(cls, lines, processes=None, keep_source=False):
+        items = cls.parse_items(lines, processes, False, keep_source)
         return cls(items)
 
     @classmethod
     def extract_key(cls, line):
         return line.split(",")[cls.key_index]
 
+    @classmethod
+    def create_instance_by_key(cls, key, line):
+        return cls.item_type_by_key(key).from_line(line)
+
     @staticmethod
-    def create_instance_by_key(key, line):
+    def item_type_by_key(key):
         raise NotImplementedError
 
 
 class Multitype_mapping_block(Multitype_block):
     def _constructor(self, items):
-        return {x.id: x for x in items}
+        return OrderedDict((int(x.id), x) for x in items)
 
-    def to_lines(self):
-        return self.header + [x.to_line() for x in self.items.values()]
+    def __add__(self, other):
+        if isinstance(other, self.__class__):
+            return self.__class__(
+                list(self.items.values()) + list(other.items.values())
+            )
+        raise ValueError("Not match class.")
+
+    def iter_lines(self):
+        return chain(self.header, (x.to_line() for x in self.items.values()))
+
+
+class Raw_block(Block_base):
+    verbatim = False
+
+    def __init__(self, lines, key="", source_header=None):
+        self.items = list(lines)
+        self.key = key
+        self.source_header = source_header
+
+    def __add__(self, other):
+        if isinstance(other, self.__class__) and other.key == self.key:
+            return self.__class__(
+                self.items + other.header + other.items, self.key, self.source_header
+            )
+        raise ValueError("Not match class.")
+
+    def iter_lines(self):
+        return chain(self.header, self.items)
 
 
 class Block_in_block(Block_base):
@@ -142,8 +275,8 @@ class Block_in_block(Block_base):
     key_index = 0
     key_type = Keyword
 
-    def to_lines(self):
-        return self.header + sum([x.to_lines() for x in self.items], [])
+    def iter_lines(self):
+        return chain(self.header, chain.from_iterable(x.iter_lines() for x in self.items))
 
 #     @classmethod
 #     def from_lines(self):
@@ -163,19 +296,21 @@ class bVersion(Singleline_block):
 class Nodes(Mapping_block):
     item_type = Node
     key = "NODE"
+    parallel = True
 
 
 class Elements(Multitype_mapping_block):
     key = "ELEMENT"
+    parallel = True
     key_index = 1
     key_type = Element_type
 
     @staticmethod
-    def create_instance_by_key(key, line):
+    def item_type_by_key(key):
         if int(key) < 2:
-            return Line_element.from_line(line)
+            return Line_element
         elif int(key) == 4:
-            return Plate_element.from_line(line)
+            return Plate_element
         raise TypeError("{} is not supported type".format(key))
 
 
@@ -197,13 +332,14 @@ class Materials(Multitype_mapping_block):
     key_type = Positive_integer
 
     @staticmethod
-    def create_instance_by_key(key, line):
+    def item_type_by_key(key):
         if int(key) == 1:
-            return DB_material.from_line(line)
+            return DB_material
         elif int(key) == 2:
-            return Isotropic_material.from_line(line)
+            return Isotropic_material
         elif int(key) == 3:
-            return Orthotropic_material.from_line(line)
+            return Orthotropic_material
+        raise TypeError("This line cannot convert mgt object.")
 
 
 class Sections(Multitype_mapping_block):
@@ -212,11 +348,11 @@ class Sections(Multitype_mapping_block):
     key_type = Positive_integer
 
     @staticmethod
-    def create_instance_by_key(key, line):
+    def item_type_by_key(key):
         if int(key) == 1:
-            return DB_section.from_line(line)
+            return DB_section
         elif int(key) == 2:
-            return Shaped_section.from_line(line)
+            return Shaped_section
         raise TypeError("This line cannot convert mgt object.")
 
 
@@ -226,7 +362,7 @@ class Thicknesses(Fixed_length_block):
     key = "THICKNESS"
 
 
-class bStatic_load_case(Singleline_block):
+class bStatic_load_case(Fixed_length_block):
     item_type = Static_load_case
     line_num = 1
     key = "STLDCASE"
@@ -238,9 +374,9 @@ class bLoad_to_mass(Singleline_block):
     key = "LOADTOMASS"
 
     @classmethod
-    def from_lines(cls, lines):
+    def from_lines(cls, lines, keep_source=False):
         if len(lines) == 2:
-            item = cls.item_type.from_line(lines)
+            item = cls.item_type.from_line(lines, keep_source)
             return cls(item)
         raise ValueError("Not convert loat to mass class. line num don't match.")
 
@@ -249,42 +385,52 @@ class bSelfweight(Singleline_block):
     item_type = Selfweight
     line_num = 1
     key = "SELFWEIGHT"
+    is_load = True
 
 
 class Concentrated_loads(Fixed_length_block):
     item_type = Concentrated_load
     line_num = 1
     key = "CONLOAD"
+    is_load = True
+    parallel = True
 
 
 class Beam_loads(Fixed_length_block):
     item_type = Beam_load
     line_num = 1
     key = "BEAMLOAD"
+    is_load = True
+    parallel = True
 
 
 class Pressures(Fixed_length_block):
     item_type = Pressure
     line_num = 1
     key = "PRESSURE"
+    is_load = True
+    parallel = True
 
 
 class Nodal_temperatures(Fixed_length_block):
     item_type = Nodal_temperature
     line_num = 1
     key = "NDTEMPER"
+    is_load = True
 
 
 class Element_temepratures(Fixed_length_block):
     item_type = Element_temperature
     line_num = 1
     key = "ELTEMPER"
+    is_load = True
 
 
 class Nodal_body_forces(Fixed_length_block):
     item_type = Nodal_body_force
     line_num = 1
     key = "NBODYFORCE"
+    is_load = True
 
 
 class Load_combinations(Fixed_length_block):
@@ -293,6 +439,30 @@ class Load_combinations(Fixed_length_block):
     key = "LOADCOMB"
 
 
+BLOCK_CLASSES = (
+    bUnit,
+    bVersion,
+    Nodes,
+    Elements,
+    Constraints,
+    Frame_rlses,
+    Materials,
+    Sections,
+    Thicknesses,
+    bStatic_load_case,
+    bLoad_to_mass,
+    bSelfweight,
+    Concentrated_loads,
+    Beam_loads,
+    Pressures,
+    Nodal_temperatures,
+    Element_temepratures,
+    Nodal_body_forces,
+    Load_combinations
+)
+BLOCK_REGISTRY = {x.key: x for x in BLOCK_CLASSES}
+
+
 if __name__ == "__main__":
     unit = bUnit(Unit())
     print(unit.to_lines())
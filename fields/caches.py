@@ -0,0 +1,185 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from blocks import BLOCK_REGISTRY
+from models import Model, Lazy_model
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".blk"
+DEFAULT_CACHE_BYTES = 1 << 30
+CACHE_ERRORS = (
+    IOError,
+    OSError,
+    ValueError,
+    KeyError,
+    EOFError,
+    pickle.UnpicklingError,
+    zipfile.BadZipfile
+)
+
+
+def block_name(block_class):
+    return "{}.{}".format(block_class.__module__, block_class.__name__)
+
+
+def section_digest(block_class, data, options=()):
+    md5 = hashlib.md5()
+    header = [CACHE_VERSION, block_name(block_class)] + list(options)
+    md5.update(json.dumps(header).encode("ascii"))
+    md5.update(data)
+    return md5.hexdigest()
+
+
+def dump_block(block):
+    if hasattr(block, "to_arrays"):
+        buffer = io.BytesIO()
+        np.savez(buffer, **block.to_arrays())
+        return "npz", buffer.getvalue()
+    return "pickle", pickle.dumps(block, pickle.HIGHEST_PROTOCOL)
+
+
+def load_block(block_class, kind, payload):
+    if kind == "npz":
+        arrays = np.load(io.BytesIO(payload))
+        return block_class.from_arrays({k: arrays[k] for k in arrays.files})
+    elif kind == "pickle":
+        return pickle.loads(payload)
+    raise ValueError("Not supported cache format: {}".format(kind))
+
+
+class Block_cache(object):
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __repr__(self):
+        return "<Block_cache:{} {}hits {}misses>".format(
+            self.directory, self.hits, self.misses
+        )
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest + CACHE_SUFFIX)
+
+    def _entries(self):
+        paths = [
+            os.path.join(self.directory, x) for x in os.listdir(self.directory)
+            if x.endswith(CACHE_SUFFIX)
+        ]
+        entries = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def size(self):
+        return sum([x[1] for x in self._entries()])
+
+    def get(self, digest, block_class):
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline().decode("ascii"))
+                payload = f.read()
+            if header["block"] != block_name(block_class):
+                raise ValueError("Not match cached block class.")
+            block = load_block(block_class, header["format"], payload)
+            os.utime(path, None)
+        except CACHE_ERRORS:
+            if os.path.exists(path):
+                os.remove(path)
+            return None
+        return block
+
+    def put(self, digest, block):
+        kind, payload = dump_block(block)
+        header = {"version": CACHE_VERSION, "block": block_name(type(block)), "format": kind}
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write((json.dumps(header) + "\n").encode("ascii"))
+            f.write(payload)
+        os.rename(temp_path, self._path(digest))
+        self.evict()
+
+    def fetch(self, block_class, data, parse, options=()):
+        digest = section_digest(block_class, data, options)
+        block = self.get(digest, block_class)
+        if block is not None:
+            self.hits += 1
+            return block
+        self.misses += 1
+        block = parse()
+        self.put(digest, block)
+        return block
+
+    def evict(self):
+        entries = self._entries()
+        total = sum([x[1] for x in entries])
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            os.remove(path)
+
+
+def load_model(path, cache, registry=BLOCK_REGISTRY, encoding="utf-8", processes=None):
+    with Lazy_model(path, registry, encoding, processes, cache=cache) as lazy:
+        return Model(
+            OrderedDict((k, lazy[k]) for k in lazy.keys()),
+            OrderedDict((x, lazy.load_blocks(x)) for x in lazy.load_cases),
+            lazy.sections
+        )
+
+
+if __name__ == "__main__":
+    import shutil
+    import time
+
+    from columnar import COLUMNAR_REGISTRY
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "model.mgt")
+    with open(path, "w") as f:
+        f.write("*UNIT\nKN, M, KJ, C\n*NODE\n")
+        f.write("".join(["{}, {}.0, 0.0, 3.0\n".format(i, i) for i in range(1, 200001)]))
+        f.write("*ELEMENT\n")
+        f.write("".join([
+            "{}, BEAM, 1, 1, {}, {}, 0, 0\n".format(i, i, i + 1) for i in range(1, 200000)
+        ]))
+        f.write("*USE-STLD, DL\n*CONLOAD\n2, 0, 0, -10, 0, 0, 0, \n*ENDDATA\n")
+
+    cache = Block_cache(os.path.join(directory, "cache"))
+    for label in ("cold", "warm"):
+        start = time.time()
+        model = load_model(path, cache, COLUMNAR_REGISTRY)
+        print("{}: {:.3f}s {}".format(label, time.time() - start, cache))
+    print(model)
+    print(model["NODE"].to_lines()[:3])
+    print(model.load_blocks("DL")["CONLOAD"].to_lines())
+    print(cache.size())
+    shutil.rmtree(directory)
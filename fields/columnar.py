@@ -0,0 +1,626 @@
+import warnings
+from functools import reduce
+from itertools import chain
+
+import numpy as np
+
+from blocks import Block_base, BLOCK_REGISTRY, WRITE_CHUNK_LINES
+from datasets import Node, Line_element, Plate_element, Thickness
+from fields import Element_type, Mgt_flag, Id_list
+from common import ELEMENT_TYPE_TUPLE, THICKNESS_TYPE_TUPLE
+
+ELEMENT_TYPE_CODES = {x: str(i) for i, x in enumerate(ELEMENT_TYPE_TUPLE)}
+THICKNESS_TOKEN_CODES = dict(
+    {x: str(i) for i, x in enumerate(THICKNESS_TYPE_TUPLE)},
+    **{k: str(int(v)) for k, v in Mgt_flag.ref_dict.items()}
+)
+
+
+def parse_values(lines, token_codes=None):
+    text = "\n".join(lines)
+    for token in sorted(token_codes or (), key=len, reverse=True):
+        text = text.replace(token, token_codes[token])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return np.fromstring(text.replace(",", " "), sep=" ")
+
+
+def bulk_parse(lines, width, token_codes=None):
+    values = parse_values(lines, token_codes)
+    if len(values) != len(lines) * width:
+        raise ValueError("Not match field num of bulk parsed lines.")
+    return values.reshape(-1, width)
+
+
+def bulk_parse_ragged(lines, token_codes=None):
+    stripped = [x.rstrip(" \t\r,") for x in lines]
+    widths = np.array([x.count(",") + 1 for x in stripped], dtype=np.int64)
+    values = parse_values(stripped, token_codes)
+    if len(values) != widths.sum():
+        raise ValueError("Not match field num of bulk parsed lines.")
+    offsets = np.concatenate([[0], np.cumsum(widths)[:-1]])
+    return values, offsets, widths
+
+
+def row_chunks(size, chunk_size=WRITE_CHUNK_LINES):
+    return (slice(i, i + chunk_size) for i in range(0, size, chunk_size))
+
+
+class Sorted_index(object):
+    def __init__(self, ids):
+        self.order = np.argsort(ids, kind="mergesort")
+        self.sorted_ids = ids[self.order]
+
+    def __len__(self):
+        return len(self.order)
+
+    def __contains__(self, item_id):
+        idx = np.searchsorted(self.sorted_ids, item_id)
+        return idx < len(self) and self.sorted_ids[idx] == item_id
+
+    def positions(self, item_ids):
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        pos = np.searchsorted(self.sorted_ids, item_ids)
+        pos = np.minimum(pos, max(len(self) - 1, 0))
+        if len(self) == 0 or (self.sorted_ids[pos] != item_ids).any():
+            raise KeyError("There is not {} in ids.".format(item_ids))
+        return self.order[pos]
+
+
+class Columnar_nodes(Block_base):
+    item_type = Node
+    key = "NODE"
+    verbatim = False
+
+    def __init__(self, ids=(), coordinates=()):
+        self.set_arrays(ids, coordinates)
+
+    def __repr__(self):
+        return "<{}:{}items>".format(self.key, len(self))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __add__(self, other):
+        if isinstance(other, self.__class__):
+            return self.__class__(
+                np.concatenate([self.ids, other.ids]),
+                np.concatenate([self.coordinates, other.coordinates])
+            )
+        raise ValueError("Not match class.")
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __contains__(self, node_id):
+        return int(node_id) in self._index
+
+    def __getitem__(self, node_id):
+        idx = self.index_of(int(node_id))
+        return self.item_type(int(self.ids[idx]), *self.coordinates[idx].tolist())
+
+    def set_arrays(self, ids, coordinates):
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)
+        if len(ids) != len(coordinates):
+            raise ValueError("Not match length of ids and coordinates.")
+        if (ids <= 0).any():
+            raise ValueError("This field can define only natural number")
+        index = Sorted_index(ids)
+        is_last = np.append(index.sorted_ids[1:] != index.sorted_ids[:-1], True)
+        if not is_last.all():
+            keep = np.sort(index.order[is_last])
+            ids = ids[keep]
+            coordinates = coordinates[keep]
+            index = Sorted_index(ids)
+        self.ids = ids
+        self.coordinates = coordinates
+        self._index = index
+
+    def index_of(self, node_ids):
+        return self._index.positions(node_ids)
+
+    def coordinates_of(self, node_ids):
+        return self.coordinates[self.index_of(node_ids)]
+
+    def format_rows(self, rows):
+        return [
+            ", ".join(map(str, [i] + xyz)) for i, xyz in zip(
+                self.ids[rows].tolist(), self.coordinates[rows].tolist()
+            )
+        ]
+
+    def iter_lines(self):
+        return chain(self.header, chain.from_iterable(
+            self.format_rows(x) for x in row_chunks(len(self.ids))
+        ))
+
+    def to_arrays(self):
+        return {"ids": self.ids, "coordinates": self.coordinates}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["ids"], arrays["coordinates"])
+
+    @classmethod
+    def from_items(cls, items):
+        items = list(items)
+        return cls(
+            [int(x.id) for x in items],
+            [(x.x, x.y, x.z) for x in items]
+        )
+
+    @classmethod
+    def from_lines(cls, lines):
+        try:
+            values = bulk_parse(lines, len(cls.item_type.fields))
+            return cls(values[:, 0], values[:, 1:])
+        except ValueError:
+            pass
+        rows = [x.split(",") for x in lines]
+        ids = [int(x[0]) for x in rows]
+        coordinates = [[float(v) for v in x[1:4]] for x in rows]
+        return cls(ids, coordinates)
+
+
+def run_sizes(runs):
+    return (runs[:, 1] - runs[:, 0]) // runs[:, 2] + 1
+
+
+def runs_to_array(runs):
+    runs = np.asarray(runs, dtype=np.int64).reshape(-1, 3)
+    counts = run_sizes(runs)
+    steps = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(runs[:, 0], counts) + steps * np.repeat(runs[:, 2], counts)
+
+
+def id_list_rows(items, field="id_list"):
+    runs = [Id_list(getattr(x, field)).runs for x in items]
+    flat = np.asarray([r for x in runs for r in x], dtype=np.int64).reshape(-1, 3)
+    rows = np.repeat(np.arange(len(runs)), [len(x) for x in runs])
+    return runs_to_array(flat), np.repeat(rows, run_sizes(flat))
+
+
+def node_arrays(nodes):
+    if isinstance(nodes, Columnar_nodes):
+        return nodes.ids, nodes.coordinates
+    items = nodes.items.values() if isinstance(nodes, Block_base) else nodes
+    columnar = Columnar_nodes.from_items(items)
+    return columnar.ids, columnar.coordinates
+
+
+class Element_table(object):
+    item_type = None
+    node_fields = ()
+    extra_fields = ()
+    extra_dtypes = ()
+
+    def __init__(self, ids=(), types=(), imats=(), isects=(), nodes=(), **extras):
+        self.ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        self.types = np.asarray(types, dtype=np.int8).reshape(-1)
+        self.imats = np.asarray(imats, dtype=np.int64).reshape(-1)
+        self.isects = np.asarray(isects, dtype=np.int64).reshape(-1)
+        self.nodes = np.asarray(nodes, dtype=np.int64).reshape(
+            -1, len(self.node_fields)
+        )
+        self.extras = {
+            f: np.asarray(extras.get(f, ()), dtype=d).reshape(-1)
+            for f, d in zip(self.extra_fields, self.extra_dtypes)
+        }
+        if any(len(x) != len(self.ids) for x in self._columns()):
+            raise ValueError("Not match length of element columns.")
+        self._index = Sorted_index(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __add__(self, other):
+        return self.__class__(
+            np.concatenate([self.ids, other.ids]),
+            np.concatenate([self.types, other.types]),
+            np.concatenate([self.imats, other.imats]),
+            np.concatenate([self.isects, other.isects]),
+            np.concatenate([self.nodes, other.nodes]),
+            **{
+                f: np.concatenate([self.extras[f], other.extras[f]])
+                for f in self.extra_fields
+            }
+        )
+
+    def __contains__(self, element_id):
+        return element_id in self._index
+
+    def __getitem__(self, element_id):
+        return self.item_type(*self._row(self.index_of(element_id)))
+
+    def _columns(self):
+        return [self.types, self.imats, self.isects, self.nodes] + [
+            self.extras[f] for f in self.extra_fields
+        ]
+
+    def _row(self, idx):
+        return [
+            int(self.ids[idx]),
+            int(self.types[idx]),
+            int(self.imats[idx]),
+            int(self.isects[idx])
+        ] + self.nodes[idx].tolist() + [
+            self.extras[f][[idx]].tolist()[0] for f in self.extra_fields
+        ]
+
+    def index_of(self, element_ids):
+        return self._index.positions(element_ids)
+
+    def take(self, mask):
+        return self.__class__(
+            self.ids[mask],
+            self.types[mask],
+            self.imats[mask],
+            self.isects[mask],
+            self.nodes[mask],
+            **{f: self.extras[f][mask] for f in self.extra_fields}
+        )
+
+    def format_rows(self, rows):
+        type_names = [Element_type.ref_tuple[x] for x in self.types[rows].tolist()]
+        columns = [
+            self.ids[rows].tolist(),
+            type_names,
+            self.imats[rows].tolist(),
+            self.isects[rows].tolist()
+        ]
+        columns += self.nodes[rows].T.tolist()
+        columns += [self.extras[f][rows].tolist() for f in self.extra_fields]
+        return [", ".join(map(str, x)) for x in zip(*columns)]
+
+    def iter_lines(self):
+        return chain.from_iterable(
+            self.format_rows(x) for x in row_chunks(len(self.ids))
+        )
+
+    def to_lines(self):
+        return list(self.iter_lines())
+
+    def to_arrays(self, prefix=""):
+        arrays = {
+            "ids": self.ids,
+            "types": self.types,
+            "imats": self.imats,
+            "isects": self.isects,
+            "nodes": self.nodes
+        }
+        for f, d in zip(self.extra_fields, self.extra_dtypes):
+            arrays[f] = self.extras[f].astype(str) if d is object else self.extras[f]
+        return {prefix + k: v for k, v in arrays.items()}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix=""):
+        return cls(
+            arrays[prefix + "ids"],
+            arrays[prefix + "types"],
+            arrays[prefix + "imats"],
+            arrays[prefix + "isects"],
+            arrays[prefix + "nodes"],
+            **{f: arrays[prefix + f] for f in cls.extra_fields}
+        )
+
+    def with_nodes(self, nodes):
+        return self.__class__(
+            self.ids, self.types, self.imats, self.isects, nodes, **self.extras
+        )
+
+    @classmethod
+    def numeric_width(cls):
+        return len(cls.item_type.fields) - cls.extra_dtypes.count(object)
+
+    @classmethod
+    def from_array(cls, values):
+        width = cls.numeric_width()
+        defaults = cls.item_type.defaults
+        padded = np.tile(np.array(defaults[:width], dtype=np.float64), (len(values), 1))
+        padded[:, :values.shape[1]] = values
+        node_end = 4 + len(cls.node_fields)
+        return cls(
+            padded[:, 0],
+            padded[:, 1],
+            padded[:, 2],
+            padded[:, 3],
+            padded[:, 4:node_end],
+            **{
+                f: padded[:, i] if d is not object else [defaults[i]] * len(values)
+                for i, f, d in zip(
+                    range(node_end, len(defaults)), cls.extra_fields, cls.extra_dtypes
+                )
+            }
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        field_num = len(cls.item_type.fields)
+        defaults = [str(x) for x in cls.item_type.defaults]
+        padded = [x + defaults[len(x):] for x in rows]
+        columns = list(zip(*padded)) if padded else [()] * field_num
+        node_start = 4
+        node_end = node_start + len(cls.node_fields)
+        return cls(
+            [int(x) for x in columns[0]],
+            [Element_type(x).value for x in columns[1]],
+            [int(x) for x in columns[2]],
+            [int(x) for x in columns[3]],
+            [[int(v) for v in x] for x in zip(*columns[node_start:node_end])],
+            **{
+                f: [x.strip() for x in c] if d is object else [d(x) for x in c]
+                for f, d, c in zip(
+                    cls.extra_fields, cls.extra_dtypes, columns[node_end:]
+                )
+            }
+        )
+
+
+class Line_element_table(Element_table):
+    item_type = Line_element
+    node_fields = ("i", "j")
+    extra_fields = ("angle", "isb")
+    extra_dtypes = (float, int)
+
+
+class Plate_element_table(Element_table):
+    item_type = Plate_element
+    node_fields = ("n1", "n2", "n3", "n4")
+    extra_fields = ("isb", "iwid", "lcaxis")
+    extra_dtypes = (int, int, object)
+
+
+class Columnar_elements(Block_base):
+    key = "ELEMENT"
+    key_index = 1
+    verbatim = False
+
+    def __init__(self, lines=None, plates=None):
+        self.lines = Line_element_table() if lines is None else lines
+        self.plates = Plate_element_table() if plates is None else plates
+
+    def __repr__(self):
+        return "<{}:{}items>".format(self.key, len(self))
+
+    def __len__(self):
+        return len(self.lines) + len(self.plates)
+
+    def __add__(self, other):
+        if isinstance(other, self.__class__):
+            return self.__class__(self.lines + other.lines, self.plates + other.plates)
+        raise ValueError("Not match class.")
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __contains__(self, element_id):
+        return any(int(element_id) in x for x in self.tables)
+
+    def __getitem__(self, element_id):
+        for table in self.tables:
+            if int(element_id) in table:
+                return table[int(element_id)]
+        raise KeyError("There is not {} in elements.".format(element_id))
+
+    @property
+    def tables(self):
+        return self.lines, self.plates
+
+    @property
+    def ids(self):
+        return np.concatenate([x.ids for x in self.tables])
+
+    def iter_lines(self):
+        return chain(self.header, chain.from_iterable(x.iter_lines() for x in self.tables))
+
+    def to_arrays(self):
+        arrays = self.lines.to_arrays("lines.")
+        arrays.update(self.plates.to_arrays("plates."))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(
+            Line_element_table.from_arrays(arrays, "lines."),
+            Plate_element_table.from_arrays(arrays, "plates.")
+        )
+
+    @staticmethod
+    def table_type_by_key(key):
+        if key < 2:
+            return Line_element_table
+        elif key == 4:
+            return Plate_element_table
+        raise TypeError("{} is not supported type".format(key))
+
+    @classmethod
+    def from_lines(cls, lines):
+        lines = list(lines)
+        try:
+            values, offsets, widths = bulk_parse_ragged(lines, ELEMENT_TYPE_CODES)
+        except ValueError:
+            return cls.from_rows([x.split(",") for x in lines])
+        keys = values[offsets + cls.key_index].astype(np.int64)
+        tables = {Line_element_table: [], Plate_element_table: []}
+        for key in np.unique(keys).tolist():
+            table_type = cls.table_type_by_key(key)
+            for width in np.unique(widths[keys == key]).tolist():
+                rows = np.flatnonzero((keys == key) & (widths == width))
+                if width <= table_type.numeric_width():
+                    grouped = values[offsets[rows, None] + np.arange(width)]
+                    table = table_type.from_array(grouped)
+                else:
+                    table = table_type.from_rows([lines[i].split(",") for i in rows])
+                tables[table_type].append(table)
+        return cls(*[
+            reduce(lambda a, b: a + b, tables[x], x())
+            for x in (Line_element_table, Plate_element_table)
+        ])
+
+    @classmethod
+    def from_items(cls, items):
+        return cls.from_rows([x.to_line().split(",") for x in items])
+
+    @classmethod
+    def from_rows(cls, rows):
+        tables = {Line_element_table: [], Plate_element_table: []}
+        for row in rows:
+            key = Element_type(row[cls.key_index]).value
+            tables[cls.table_type_by_key(key)].append(row)
+        return cls(*[
+            x.from_rows(tables[x]) for x in (Line_element_table, Plate_element_table)
+        ])
+
+
+def columnar_elements(elements):
+    if isinstance(elements, Columnar_elements):
+        return elements
+    items = elements.items.values() if isinstance(elements, Block_base) else elements
+    return Columnar_elements.from_items(items)
+
+
+def element_arrays(elements, width=4):
+    if isinstance(elements, Columnar_elements):
+        nodes = [
+            np.pad(x.nodes, ((0, 0), (0, width - x.nodes.shape[1])), "constant")
+            for x in elements.tables
+        ]
+        return elements.ids, np.concatenate(nodes)
+    items = list(elements.items.values() if isinstance(elements, Block_base) else elements)
+    return (
+        np.array([int(x.id) for x in items], dtype=np.int64),
+        np.array([
+            [int(n) for n in x.node_ids] + [0] * (width - len(x.node_ids)) for x in items
+        ], dtype=np.int64).reshape(-1, width)
+    )
+
+
+class Columnar_thicknesses(Block_base):
+    item_type = Thickness
+    key = "THICKNESS"
+    verbatim = False
+    formatters = (
+        int,
+        lambda x: THICKNESS_TYPE_TUPLE[int(x)],
+        lambda x: str(Mgt_flag(bool(x))),
+        float,
+        float,
+        lambda x: str(Mgt_flag(bool(x))),
+        int,
+        float
+    )
+
+    def __init__(self, values=()):
+        self.values = np.asarray(values, dtype=np.float64).reshape(
+            -1, len(self.item_type.fields)
+        )
+        self._index = Sorted_index(self.ids)
+
+    def __repr__(self):
+        return "<{}:{}items>".format(self.key, len(self))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __add__(self, other):
+        if isinstance(other, self.__class__):
+            return self.__class__(np.concatenate([self.values, other.values]))
+        raise ValueError("Not match class.")
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __contains__(self, thickness_id):
+        return int(thickness_id) in self._index
+
+    def __getitem__(self, thickness_id):
+        row = self.values[self._index.positions(int(thickness_id))].tolist()
+        return self.item_type(*[f(x) for f, x in zip(self.formatters, row)])
+
+    @property
+    def ids(self):
+        return self.values[:, 0].astype(np.int64)
+
+    def column(self, field):
+        return self.values[:, self.item_type.fields.index(field)]
+
+    def to_arrays(self):
+        return {"values": self.values}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["values"])
+
+    def format_rows(self, rows):
+        return [
+            ", ".join([str(f(x)) for f, x in zip(self.formatters, row)])
+            for row in self.values[rows].tolist()
+        ]
+
+    def iter_lines(self):
+        return chain(self.header, chain.from_iterable(
+            self.format_rows(x) for x in row_chunks(len(self.values))
+        ))
+
+    @classmethod
+    def from_lines(cls, lines):
+        width = len(cls.item_type.fields)
+        try:
+            return cls(bulk_parse(lines, width, THICKNESS_TOKEN_CODES))
+        except ValueError:
+            pass
+        items = [cls.item_type.from_line(x) for x in lines]
+        return cls([
+            [
+                int(x.id),
+                THICKNESS_TYPE_TUPLE.index(str(x.type)),
+                bool(x.b_same),
+                x.thick_in,
+                x.thick_out,
+                bool(x.b_offset),
+                int(x.offtype),
+                x.value
+            ] for x in items
+        ])
+
+
+COLUMNAR_BLOCK_CLASSES = (
+    Columnar_nodes,
+    Columnar_elements,
+    Columnar_thicknesses
+)
+COLUMNAR_REGISTRY = dict(BLOCK_REGISTRY)
+COLUMNAR_REGISTRY.update({x.key: x for x in COLUMNAR_BLOCK_CLASSES})
+
+
+if __name__ == "__main__":
+    nodes = Columnar_nodes.from_lines(
+        ["1, 1.0, 2.0, 3.0", "3, 7.0, 8.0, 9.0", "2, 4.0, 5.0, 6.0"]
+    )
+    print(nodes)
+    print(nodes.to_lines())
+    print(nodes[2])
+    print(nodes.coordinates_of([3, 1]))
+
+    elements = Columnar_elements.from_lines(
+        [
+            "1, BEAM, 1, 1, 1, 3, 0, 0",
+            "2, TRUSS, 1, 2, 3, 2, 30, 0",
+            "3, PLATE, 2, 1, 1, 2, 3, 0, 1, 0"
+        ]
+    )
+    print(elements)
+    print(elements.to_lines())
+    print(elements.plates.nodes)
+    print(elements[1].search_coordinates(nodes))
+    print(elements[3].node_ids)
+
+    thicknesses = Columnar_thicknesses.from_lines(
+        [
+            "1, VALUE, YES, 0.15, 0, NO, 0, 0",
+            "2, VALUE, YES, 0.2, 0, YES, 1, 0.05"
+        ]
+    )
+    print(thicknesses.to_lines())
+    print(thicknesses.column("thick_in"))
@@ -0,0 +1,207 @@
+from collections import OrderedDict
+from itertools import chain, product
+
+import numpy as np
+
+from blocks import WRITE_CHUNK_LINES, write_lines
+from datasets import COMBINATION_NAME_KEY
+
+COMBINATION_KIND = "CB"
+COMBINATION_KEY = "LOADCOMB"
+STATIC_KIND = "ST"
+FACTOR_DIGITS = 12
+
+
+def is_combination_kind(kind):
+    return kind.upper().startswith(COMBINATION_KIND)
+
+
+def term_alternatives(cases):
+    if isinstance(cases, dict):
+        return [cases]
+    if not isinstance(cases, (list, tuple)):
+        return [{cases: 1.0}]
+    return [x if isinstance(x, dict) else {x: 1.0} for x in cases]
+
+
+def expand_rule(terms):
+    terms = [(factor, term_alternatives(cases)) for factor, cases in terms]
+    for choice in product(*[x[1] for x in terms]):
+        factors = OrderedDict()
+        for (factor, _), cases in zip(terms, choice):
+            for case, value in cases.items():
+                factors[case] = factors.get(case, 0.0) + factor * value
+        yield OrderedDict((k, v) for k, v in factors.items() if v != 0.0)
+
+
+def generate_combinations(rules, prefix="LCB", start=1, dedupe=True):
+    seen = set()
+    number = start
+    for factors in chain.from_iterable(expand_rule(x) for x in rules):
+        if not factors:
+            continue
+        if dedupe:
+            key = tuple(sorted((k, round(v, FACTOR_DIGITS)) for k, v in factors.items()))
+            if key in seen:
+                continue
+            seen.add(key)
+        yield "{}{}".format(prefix, number), factors
+        number += 1
+
+
+def describe_factors(factors):
+    return "".join([
+        "{}{}{}".format("-" if v < 0 else "+", abs(v), k) for k, v in factors.items()
+    ]).lstrip("+")
+
+
+def combination_lines(generated, kind="GEN", active="ACTIVE", describe=True):
+    for name, factors in generated:
+        yield "{}={}, {}, {}, 0, 0, {}, 0, 0".format(
+            COMBINATION_NAME_KEY, name, kind, active, describe_factors(factors) if describe else ""
+        )
+        yield ", ".join(
+            ["{}, {}, {}".format(STATIC_KIND, k, float(v)) for k, v in factors.items()]
+        )
+
+
+def write_combinations(fileobj, rules, prefix="LCB", start=1, dedupe=True,
+                       chunk_size=WRITE_CHUNK_LINES, **options):
+    lines = combination_lines(generate_combinations(rules, prefix, start, dedupe), **options)
+    write_lines(fileobj, chain(["*" + COMBINATION_KEY], lines), chunk_size)
+
+
+class Combination_matrix(object):
+    def __init__(self, combinations, cases=()):
+        items = list(combinations)
+        self.names = [str(x.name) for x in items]
+        self._entries = OrderedDict(
+            (str(x.name), getattr(x.load_case_factor, "value", x.load_case_factor))
+            for x in items
+        )
+        self.cases = list(cases)
+        self._columns = {x: i for i, x in enumerate(self.cases)}
+        self._rows = {}
+        rows = [self._resolve(x, ()) for x in self.names]
+        self.indptr = np.cumsum([0] + [len(x) for x in rows]).astype(np.int64)
+        self.indices = np.array(
+            [self._columns[k] for x in rows for k in x], dtype=np.int64
+        )
+        self.data = np.array([v for x in rows for v in x.values()], dtype=np.float64)
+        self._dense = self.dense()
+
+    def __repr__(self):
+        return "<Combination_matrix:{}combinations {}cases {}factors>".format(
+            len(self.names), len(self.cases), len(self.data)
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def _column(self, case):
+        if case not in self._columns:
+            self._columns[case] = len(self.cases)
+            self.cases.append(case)
+        return self._columns[case]
+
+    def _resolve(self, name, path):
+        if name in path:
+            raise ValueError("Circular load combination: {}".format(
+                " -> ".join(path + (name,))
+            ))
+        if name in self._rows:
+            return self._rows[name]
+        if name not in self._entries:
+            raise KeyError("There is not {} in load combinations.".format(name))
+        row = OrderedDict()
+        for (kind, case), factor in self._entries[name].items():
+            if is_combination_kind(kind):
+                terms = self._resolve(case, path + (name,)).items()
+            else:
+                column = case if kind.upper() == STATIC_KIND else (kind.upper(), case)
+                self._column(column)
+                terms = [(column, 1.0)]
+            for key, value in terms:
+                row[key] = row.get(key, 0.0) + factor * value
+        self._rows[name] = row
+        return row
+
+    def row(self, name):
+        return OrderedDict(self._rows[name])
+
+    def dense(self):
+        matrix = np.zeros((len(self.names), len(self.cases)))
+        rows = np.repeat(np.arange(len(self.names)), np.diff(self.indptr))
+        np.add.at(matrix, (rows, self.indices), self.data)
+        return matrix
+
+    def stack(self, values_by_case):
+        sample = np.asarray(next(iter(values_by_case.values()), 0.0), dtype=np.float64)
+        stacked = np.zeros((len(self.cases),) + sample.shape)
+        for case, values in values_by_case.items():
+            if case in self._columns:
+                stacked[self._columns[case]] = values
+        return stacked
+
+    def apply(self, stacked):
+        stacked = np.asarray(stacked, dtype=np.float64)
+        if len(stacked) != len(self.cases):
+            raise ValueError("Not match number of load cases.")
+        combined = self._dense.dot(stacked.reshape(len(self.cases), -1))
+        return combined.reshape((len(self.names),) + stacked.shape[1:])
+
+    def combine(self, values_by_case):
+        return OrderedDict(zip(self.names, self.apply(self.stack(values_by_case))))
+
+    @classmethod
+    def from_model(cls, model):
+        items = model[COMBINATION_KEY].items if COMBINATION_KEY in model else []
+        return cls(items, list(model.loads))
+
+
+if __name__ == "__main__":
+    import sys
+
+    from loads import Nodal_loads
+    from models import Model
+
+    model = Model.from_lines([
+        "*NODE",
+        "1, 0.0, 0.0, 0.0",
+        "2, 0.0, 0.0, 3.0",
+        "3, 4.0, 0.0, 3.0",
+        "*USE-STLD, DL",
+        "*CONLOAD",
+        "2 3, 0, 0, -10, 0, 0, 0, ",
+        "*USE-STLD, LL",
+        "*CONLOAD",
+        "3, 0, 0, -5, 0, 0, 0, ",
+        "*USE-STLD, WX",
+        "*CONLOAD",
+        "2, 20, 0, 0, 0, 0, 0, ",
+        "*LOADCOMB",
+        "NAME=LC1, GEN, ACTIVE, 0, 0, , 0, 0",
+        "ST, DL, 1.2, ST, LL, 1.6",
+        "NAME=LC2, GEN, ACTIVE, 0, 0, , 0, 0",
+        "CB, LC1, 0.75, ST, WX, 1.0",
+        "NAME=LC3, GEN, ACTIVE, 0, 0, , 0, 0",
+        "ST, DL, 1.0, CB, LC2, 1.0",
+        "NAME=LC4, GEN, ACTIVE, 0, 0, , 0, 0",
+        "ST, DL, 1.0, RS, RX, 1.0"
+    ])
+    matrix = Combination_matrix.from_model(model)
+    print(matrix)
+    print(matrix.cases)
+    print(matrix.dense())
+    for name, values in matrix.combine(Nodal_loads.from_model(model).resultants()).items():
+        print(name, values)
+
+    rules = [
+        [(1.0, "DL"), (1.0, "LL")],
+        [(1.2, "DL"), (1.6, "LL")],
+        [(1.0, "LL"), (1.0, "DL")],
+        [(1.0, "DL"), (1.0, "DL")],
+        [(1.0, "DL"), (-1.0, "DL")],
+        [(1.0, "DL"), (0.5, "LL"), (1.0, [{"WX": 1.0}, {"WX": -1.0}, {"WX": 0.3, "LL": 0.0}])],
+    ]
+    write_combinations(sys.stdout, rules)
@@ -28,4 +28,6 @@ LOAD_CASE_TYPE_TUPLE = (
     "B", "CR", "SH", "T", "PS",
     "CS", "ER", "IL", "BK", "WL",
     "CF", "CO", "RS", "EX", "I", "EE"
-)
\ No newline at end of file
+)
+THICKNESS_TYPE_TUPLE = ("VALUE", "STIFFNESS")
+DOF_TUPLE = ("DX", "DY", "DZ", "RX", "RY", "RZ")
@@ -3,12 +3,9 @@ from distutils.version import StrictVersion
 
 from collections import namedtuple
 
-from utils import (
-    grouping_values_by_discrete_index_flag,
-    grouping_values_by_index
-)
 from mixins import ElementMixin
 from fields import (
+    Field_factory,
     Natural_number,
     Positive_integer,
     Stripped_str,
@@ -16,6 +13,7 @@ from fields import (
     Dof_flags,
     Id_list,
     Load_case_dict,
+    Combination_case_dict,
     Element_type,
     Direction_type,
     Material_type,
@@ -26,6 +24,191 @@ from fields import (
     Load_case_type
 )
 
+COMBINATION_NAME_KEY = "NAME"
+
+
+class Source_line(str):
+    def __new__(cls, text, source=None):
+        line = str.__new__(cls, text)
+        line.source = text if source is None else source
+        return line
+
+    def __reduce__(self):
+        return Source_line, (str(self), self.source)
+
+
+def restore_dataset(dataset_type, values, source=None):
+    dataset = dataset_type.__new__(dataset_type)
+    dataset._dataset = dataset_type.dataset_class(*values)
+    if source is not None:
+        dataset.attach_source(source)
+    return dataset
+
+
+def restore_record(dataset_type, values):
+    return dataset_type.record_class(*values)
+
+
+def is_field(datatype):
+    return isinstance(datatype, type) and issubclass(datatype, Field_factory)
+
+
+def field_codec(datatype):
+    if is_field(datatype):
+        return datatype.decode, datatype.encode
+    return datatype, str
+
+
+def build_parser(dataset_class, datatypes):
+    names = ["cast{}".format(i) for i in range(len(datatypes))]
+    casts = "".join(["{}(params[{}]), ".format(x, i) for i, x in enumerate(names)])
+    source = (
+        "def parse_params(params):\n"
+        "    if len(params) >= {}:\n"
+        "        return new(dataset_class, ({}))\n"
+        "    return dataset_class(*[cast(x) for x, cast in zip(params, datatypes)])\n"
+    ).format(len(datatypes), casts)
+    namespace = dict(
+        zip(names, datatypes),
+        new=tuple.__new__,
+        dataset_class=dataset_class,
+        datatypes=datatypes
+    )
+    exec(source, namespace)
+    return namespace["parse_params"]
+
+
+def decode_statements(i, datatype, as_field):
+    param = "params[{}]".format(i)
+    if datatype in (float, int, str):
+        return [], "{}({})".format(datatype.__name__, param)
+    if not is_field(datatype) or datatype.decode_source is None:
+        return [], "cast{}({})".format(i, param)
+    cls, value = "type{}".format(i), "value{}".format(i)
+    lines = ["{} = {}".format(value, datatype.decode_source.format(value=param, cls=cls))]
+    if datatype.check_source:
+        lines += [
+            "if not {}:".format(datatype.check_source.format(value=value, cls=cls)),
+            "    raise ValueError({}.check_message)".format(cls)
+        ]
+    if not as_field:
+        return lines, value
+    field_lines, field = field_statements(i, datatype, value)
+    return lines + field_lines, field
+
+
+def field_statements(i, datatype, value):
+    cls = "type{}".format(i)
+    if datatype.member_source:
+        return [], datatype.member_source.format(value=value, cls=cls)
+    field = "field{}".format(i)
+    return [
+        "{} = new_field({})".format(field, cls),
+        "{}.value = {}".format(field, value)
+    ], field
+
+
+def build_text_parser(dataset_class, datatypes, as_field=True):
+    statements, values = [], []
+    for i, datatype in enumerate(datatypes):
+        lines, value = decode_statements(i, datatype, as_field)
+        statements += lines
+        values.append(value)
+    casts = tuple([x if as_field else field_codec(x)[0] for x in datatypes])
+    source = (
+        "def parse_text(params):\n"
+        "    if len(params) < {}:\n"
+        "        return dataset_class(*[cast(x) for x, cast in zip(params, casts)])\n"
+        "{}"
+        "    return new(dataset_class, ({}))\n"
+    ).format(
+        len(datatypes),
+        "".join(["    {}\n".format(x) for x in statements]),
+        "".join(["{}, ".format(x) for x in values])
+    )
+    namespace = dict(
+        [("cast{}".format(i), x) for i, x in enumerate(casts)]
+        + [("type{}".format(i), x) for i, x in enumerate(datatypes)],
+        new=tuple.__new__,
+        new_field=object.__new__,
+        dataset_class=dataset_class,
+        casts=casts
+    )
+    exec(source, namespace)
+    return namespace["parse_text"]
+
+
+def build_decoded_parser(dataset_class, datatypes):
+    statements, values = [], []
+    for i, datatype in enumerate(datatypes):
+        value = "params[{}]".format(i)
+        if is_field(datatype):
+            lines, value = field_statements(i, datatype, value)
+            statements += lines
+        values.append(value)
+    source = (
+        "def parse_decoded(params):\n"
+        "{}"
+        "    return new(dataset_class, ({}))\n"
+    ).format(
+        "".join(["    {}\n".format(x) for x in statements]),
+        "".join(["{}, ".format(x) for x in values])
+    )
+    namespace = dict(
+        [("type{}".format(i), x) for i, x in enumerate(datatypes)],
+        new=tuple.__new__,
+        new_field=object.__new__,
+        dataset_class=dataset_class
+    )
+    exec(source, namespace)
+    return namespace["parse_decoded"]
+
+
+def build_template(field_num, lf_positions=()):
+    separators = ["\n" if i in lf_positions else ", " for i in range(1, field_num)]
+    return "%s" + "".join([x + "%s" for x in separators])
+
+
+def encode_expression(i, datatype, as_field):
+    value = "dataset[{}]".format(i)
+    if is_field(datatype) and datatype.encode_source is not None:
+        value = value + ".value" if as_field else value
+        return datatype.encode_source.format(value=value, cls="type{}".format(i))
+    if as_field or not is_field(datatype):
+        return value
+    return "encode{}({})".format(i, value)
+
+
+def build_formatter(datatypes, lf_positions=(), as_field=True):
+    source = (
+        "def format_dataset(dataset):\n"
+        "    return template % ({})\n"
+    ).format("".join([
+        "{}, ".format(encode_expression(i, x, as_field)) for i, x in enumerate(datatypes)
+    ]))
+    namespace = dict(
+        [("type{}".format(i), x) for i, x in enumerate(datatypes)]
+        + [("encode{}".format(i), field_codec(x)[1]) for i, x in enumerate(datatypes)],
+        template=build_template(len(datatypes), lf_positions)
+    )
+    exec(source, namespace)
+    return namespace["format_dataset"]
+
+
+def build_record_class(name, fields, defaults):
+    record_base = namedtuple(name + "_record", fields)
+    record_base.__new__.__defaults__ = defaults
+    return type(
+        name + "_record",
+        (record_base,),
+        {
+            "__slots__": (),
+            "__reduce__": lambda self: (restore_record, (self.dataset_type, tuple(self))),
+            "to_line": lambda self: self.dataset_type.format_record(self),
+            "to_dataset": lambda self: self.dataset_type.from_record(self)
+        }
+    )
+
 
 class Dataset_Meta(type):
     def __new__(cls, name, bases, d):
@@ -36,7 +219,26 @@ class Dataset_Meta(type):
         dataset_class = namedtuple(name, fields)
         dataset_class.__new__.__defaults__ = typed_defaults
         d["dataset_class"] = dataset_class
-        return type.__new__(cls, name, bases, d)
+        d["field_dict"] = dict(zip(fields, datatypes))
+        d["parse_params"] = staticmethod(build_parser(dataset_class, datatypes))
+        d["parse_text"] = staticmethod(build_text_parser(dataset_class, datatypes))
+        d["parse_decoded"] = staticmethod(build_decoded_parser(dataset_class, datatypes))
+        d["format_dataset"] = staticmethod(
+            build_formatter(datatypes, d.get("lf_positions", ()))
+        )
+        decoders = tuple([field_codec(x)[0] for x in datatypes])
+        record_defaults = tuple([
+            decode(x) for x, decode in zip(defaults, decoders)
+        ])
+        record_class = build_record_class(name, fields, record_defaults)
+        d["record_class"] = record_class
+        d["parse_record"] = staticmethod(build_text_parser(record_class, datatypes, False))
+        d.setdefault("format_record", staticmethod(
+            build_formatter(datatypes, d.get("lf_positions", ()), False)
+        ))
+        dataset_type = type.__new__(cls, name, bases, d)
+        record_class.dataset_type = dataset_type
+        return dataset_type
 
 
 class Dataset_base(object):
@@ -46,13 +248,15 @@ class Dataset_base(object):
     fields = ()
     datatypes = ()
     defaults = ()
+    _source = None
 
     def __init__(self, *args, **kwargs):
-        typed_args = self._apply_datatype(args)
         if kwargs:
+            typed_args = self._apply_datatype(args)
             typed_kwargs = {k: self.field_dict[k](v) for k, v in kwargs.items()}
             self._dataset = self.dataset_class(*typed_args, **typed_kwargs)
-        self._dataset = self.dataset_class(*typed_args)
+        else:
+            self._dataset = self.parse_params(args)
 
     def __getattr__(self, name):
         return self._dataset.__getattribute__(name)
@@ -60,29 +264,74 @@ class Dataset_base(object):
     def __repr__(self):
         return self._dataset.__repr__()
 
+    def __reduce__(self):
+        source = None if self.is_dirty else self._source[1]
+        return restore_dataset, (self.__class__, tuple(self._dataset), source)
+
     def _apply_datatype(self, params):
         return tuple([cast(x) for x, cast in zip(params, self.datatypes)])
 
     @property
-    def field_dict(self):
-        return {f: d for f, d in zip(self.fields, self.datatypes)}
+    def is_dirty(self):
+        return self._source is None or self._source[0] is not self._dataset
+
+    def attach_source(self, line):
+        lines = line if isinstance(line, (list, tuple)) else [line]
+        self._source = (self._dataset, "\n".join([getattr(x, "source", x) for x in lines]))
+        return self
+
+    def verbatim_line(self):
+        if self.is_dirty:
+            return None
+        return self._source[1]
+
+    def update(self, **kwargs):
+        self._dataset = self._dataset._replace(
+            **{k: self.field_dict[k](v) for k, v in kwargs.items()}
+        )
 
     def to_line(self):
         raise NotImplementedError
 
+    def to_record(self):
+        return self.record_class(*[
+            x.value if isinstance(x, Field_factory) else x for x in self._dataset
+        ])
+
     @classmethod
     def from_line(cls):
         raise NotImplementedError
 
+    @classmethod
+    def record_from_line(cls, line):
+        return cls.from_line(line).to_record()
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(*record)
+
+    @classmethod
+    def from_decoded(cls, values):
+        dataset = cls.__new__(cls)
+        dataset._dataset = cls.parse_decoded(values)
+        return dataset
+
 
 class Singleline_dataset(Dataset_base):
     def to_line(self):
-        return ", ".join(map(str, self._dataset))
+        if self._source is None:
+            return self.format_dataset(self._dataset)
+        return self.verbatim_line() or self.format_dataset(self._dataset)
+
+    @classmethod
+    def from_line(cls, line, keep_source=False):
+        dataset = cls.__new__(cls)
+        dataset._dataset = cls.parse_text(line.split(","))
+        return dataset.attach_source(line) if keep_source else dataset
 
     @classmethod
-    def from_line(cls, line):
-        params = line.split(",")
-        return cls(*params)
+    def record_from_line(cls, line):
+        return cls.parse_record(line.split(","))
 
 
 class Multiline_dataset(Dataset_base):
@@ -94,20 +343,24 @@ class Multiline_dataset(Dataset_base):
         super(Multiline_dataset, self).__init__(*args, **kwargs)
 
     def to_line(self):
-        divided = grouping_values_by_discrete_index_flag(
-            self._dataset,
-            lambda x: x in self.lf_positions
-        )
-        stringed = [", ".join(map(str, x)) for x in divided]
-        return "\n".join(stringed)
+        if self._source is None:
+            return self.format_dataset(self._dataset)
+        return self.verbatim_line() or self.format_dataset(self._dataset)
 
     @classmethod
-    def from_line(cls, line):
+    def from_line(cls, line, keep_source=False):
         if len(line) - 1 != len(cls.lf_positions):
             raise ValueError("Not match line num.")
         splitted = [x.split(",") for x in line]
         params = sum(splitted, [])
-        return cls(*params)
+        dataset = cls(*params)
+        return dataset.attach_source(line) if keep_source else dataset
+
+    @classmethod
+    def record_from_line(cls, line):
+        if len(line) - 1 != len(cls.lf_positions):
+            raise ValueError("Not match line num.")
+        return cls.parse_record(sum([x.split(",") for x in line], []))
 
 
 class Unit(Singleline_dataset):
@@ -116,9 +369,14 @@ class Unit(Singleline_dataset):
     defaults = ("KN", "M", "KJ", "C")
 
 
+class Stripped_version(StrictVersion):
+    def parse(self, vstring):
+        StrictVersion.parse(self, str(vstring).strip())
+
+
 class Version(Singleline_dataset):
     fields = ("version",)
-    datatypes = (StrictVersion,)
+    datatypes = (Stripped_version,)
     defaults = ("8.8.1",)
 
 
@@ -127,6 +385,10 @@ class Node(Singleline_dataset):
     datatypes = (Natural_number, float, float, float)
     defaults = (1, 0.0, 0.0, 0.0)
 
+    @property
+    def coordinate(self):
+        return self.x, self.y, self.z
+
 
 class Line_element(Singleline_dataset, ElementMixin):
     fields = ("id", "type", "imat", "isect", "i", "j", "angle", "isb")
@@ -190,7 +452,7 @@ class Plate_element(Singleline_dataset, ElementMixin):
 
     @property
     def node_ids(self):
-        if self.n4:
+        if int(self.n4):
             return self.n1, self.n2, self.n3, self.n4
         return self.n1, self.n2, self.n3
 
@@ -256,7 +518,7 @@ class Frame_rls(Multiline_dataset):
         0.0,
         0.0
     )
-    lf_positions = (8,)
+    lf_positions = (9,)
 
 
 class DB_material(Singleline_dataset):
@@ -346,7 +608,7 @@ class Isotropic_material(Singleline_dataset):
         float,
         float,
         float,
-        Positive_integer
+        float
     )
     defaults = (
         1,
@@ -363,7 +625,7 @@ class Isotropic_material(Singleline_dataset):
         0.3,
         0.000012,
         0.0,
-        0
+        0.0
     )
 
 class Orthotropic_material(Singleline_dataset):
@@ -628,11 +890,16 @@ class Load_to_mass(Multiline_dataset):
     lf_positions = (6,)
 
     @classmethod
-    def from_line(cls, line):
+    def from_line(cls, line, keep_source=False):
         splitted = [x.split(",") for x in line]
         params = splitted[0]
         lc = splitted[1]
-        return cls(*params, load_case_factor=lc)
+        dataset = cls(*params, load_case_factor=lc)
+        return dataset.attach_source(line) if keep_source else dataset
+
+    @classmethod
+    def record_from_line(cls, line):
+        return cls.from_line(line).to_record()
 
 
 class Selfweight(Singleline_dataset):
@@ -875,7 +1142,7 @@ class Load_combination(Multiline_dataset):
         Stripped_str,
         Positive_integer,
         Positive_integer,
-        Load_case_dict
+        Combination_case_dict
     )
     defaults = (
         "CB1",
@@ -891,19 +1158,29 @@ class Load_combination(Multiline_dataset):
     lf_positions = (8,)
 
     def to_line(self):
-        name = self._dataset[0].to_str_with_key("NAME")
+        if not self.is_dirty:
+            return self._source[1]
+        name = self._dataset[0].to_str_with_key(COMBINATION_NAME_KEY)
         params = [name] + list(map(str, self._dataset[1:-1]))
         param_line = ", ".join(params)
-        lc_line = self._dataset[-1].to_str_with_key("ST")
-        return param_line + "\n" + lc_line
+        return param_line + "\n" + str(self._dataset[-1])
 
     @classmethod
-    def from_line(cls, line):
+    def from_line(cls, line, keep_source=False):
         splitted = [x.split(",") for x in line]
-        params = [splitted[0][0].lstrip("NAME=")] + splitted[0][1:]
-        grouped = grouping_values_by_index(splitted[1], lambda x: x // 3)
-        lc = sum([[x[1], x[2]] for x in grouped], [])
-        return cls(*params, load_case_factor=lc)
+        name = splitted[0][0].strip()
+        if name.upper().startswith(COMBINATION_NAME_KEY + "="):
+            name = name[len(COMBINATION_NAME_KEY) + 1:]
+        dataset = cls(name, *splitted[0][1:], load_case_factor=splitted[1])
+        return dataset.attach_source(line) if keep_source else dataset
+
+    @classmethod
+    def record_from_line(cls, line):
+        return cls.from_line(line).to_record()
+
+    @classmethod
+    def format_record(cls, record):
+        return cls.from_record(record).to_line()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+import numpy as np
+
+from columnar import Sorted_index, node_arrays, columnar_elements, id_list_rows
+from common import DOF_TUPLE
+
+DOF_BITS = {x: 1 << i for i, x in enumerate(DOF_TUPLE)}
+ALL_DOFS = (1 << len(DOF_TUPLE)) - 1
+
+
+def flags_to_mask(flags):
+    return sum([1 << i for i, x in enumerate(flags) if x])
+
+
+def mask_to_flags(mask):
+    return tuple([bool(int(mask) >> i & 1) for i in range(len(DOF_TUPLE))])
+
+
+def dof_bit(dof):
+    if isinstance(dof, int):
+        return 1 << dof
+    return DOF_BITS[dof.upper()]
+
+
+def restraint_masks(node_ids, constraints):
+    masks = np.zeros(len(node_ids), dtype=np.uint8)
+    items = list(constraints)
+    if not items:
+        return masks
+    ids, rows = id_list_rows(items)
+    conditions = np.array([flags_to_mask(x.condition) for x in items], dtype=np.uint8)
+    np.bitwise_or.at(masks, Sorted_index(node_ids).positions(ids), conditions[rows])
+    return masks
+
+
+def release_masks(element_ids, frame_rlses):
+    masks = np.zeros((len(element_ids), 2), dtype=np.uint8)
+    items = list(frame_rlses)
+    if not items:
+        return masks
+    ids, rows = id_list_rows(items)
+    ends = np.array([
+        [flags_to_mask(x.i_flag), flags_to_mask(x.j_flag)] for x in items
+    ], dtype=np.uint8)
+    last = len(ids) - 1 - np.unique(ids[::-1], return_index=True)[1]
+    masks[Sorted_index(element_ids).positions(ids[last])] = ends[rows[last]]
+    return masks
+
+
+class Dof_masks(object):
+    def __init__(self, nodes, elements=None, constraints=(), frame_rlses=()):
+        self.node_ids = node_arrays(nodes)[0]
+        self.element_ids = (
+            np.zeros(0, dtype=np.int64) if elements is None else columnar_elements(elements).ids
+        )
+        self.restraints = restraint_masks(self.node_ids, constraints)
+        self.releases = release_masks(self.element_ids, frame_rlses)
+        self._nodes = Sorted_index(self.node_ids)
+        self._elements = Sorted_index(self.element_ids)
+
+    def __repr__(self):
+        return "<Dof_masks:{}restrained nodes {}released elements>".format(
+            np.count_nonzero(self.restraints), np.count_nonzero(self.releases.any(axis=1))
+        )
+
+    def restraint_of(self, node_id):
+        return int(self.restraints[self._nodes.positions(int(node_id))])
+
+    def is_fixed(self, node_id, dof):
+        return bool(self.restraint_of(node_id) & dof_bit(dof))
+
+    def release_of(self, element_id):
+        return tuple(self.releases[self._elements.positions(int(element_id))].tolist())
+
+    def restrained_nodes(self, dof=None):
+        bits = ALL_DOFS if dof is None else dof_bit(dof)
+        return self.node_ids[(self.restraints & bits) > 0]
+
+    def fixed_nodes(self):
+        return self.node_ids[self.restraints == ALL_DOFS]
+
+    def released_end_count(self, dof=None):
+        bits = ALL_DOFS if dof is None else dof_bit(dof)
+        return int(np.count_nonzero(self.releases & bits))
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(
+            model["NODE"],
+            model["ELEMENT"] if "ELEMENT" in model else None,
+            model["CONSTRAINT"] if "CONSTRAINT" in model else (),
+            model["FRAME-RLS"] if "FRAME-RLS" in model else ()
+        )
+
+
+if __name__ == "__main__":
+    from models import Model
+
+    model = Model.from_lines([
+        "*NODE",
+        "1, 0.0, 0.0, 0.0",
+        "2, 0.0, 0.0, 3.0",
+        "3, 4.0, 0.0, 3.0",
+        "4, 4.0, 0.0, 0.0",
+        "*ELEMENT",
+        "1, BEAM, 1, 1, 1, 2, 0, 0",
+        "2, BEAM, 1, 1, 2, 3, 0, 0",
+        "3, BEAM, 1, 1, 3, 4, 0, 0",
+        "*CONSTRAINT",
+        "1 4, 111111, ",
+        "2, 000001, ",
+        "*FRAME-RLS",
+        "2, NO, 000011, 0, 0, 0, 0, 0, 0",
+        "000011, 0, 0, 0, 0, 0, 0",
+    ])
+    masks = Dof_masks.from_model(model)
+    print(masks)
+    print(masks.restraints, masks.releases)
+    print(masks.is_fixed(2, "RZ"), masks.is_fixed(2, "DX"), masks.fixed_nodes())
+    print(masks.release_of(2), masks.released_end_count(), masks.released_end_count("RY"))
+    print(model["FRAME-RLS"].to_lines())
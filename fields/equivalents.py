@@ -0,0 +1,323 @@
+from operator import itemgetter
+
+import numpy as np
+
+from columnar import Sorted_index, node_arrays, columnar_elements, id_list_rows
+from common import DIRECTION_TYPE_TUPLE
+from datasets import Beam_load, Pressure
+from geometry import beam_axes, unit_vectors
+from loads import Nodal_loads, accumulate
+
+BEAM_LOAD_KEY = "BEAMLOAD"
+BEAM_LOAD_TYPES = ("CONLOAD", "CONMOMENT", "UNILOAD", "UNIMOMENT")
+STATION_FIELDS = ("d1", "p1", "d2", "p2", "d3", "p3", "d4", "p4")
+GLOBAL_AXES = np.eye(3)
+GAUSS_POINTS = 0.5 + 0.5 * np.array([-np.sqrt(0.6), 0.0, np.sqrt(0.6)])
+GAUSS_WEIGHTS = np.array([5.0, 8.0, 5.0]) / 18.0
+PRESSURE_KEY = "PRESSURE"
+PRESSURE_DIRECTIONS = DIRECTION_TYPE_TUPLE + ("VECTOR",)
+CORNER_FIELDS = ("p1", "p2", "p3", "p4")
+QUAD_CORNERS = np.array([[-1.0, -1.0], [1.0, -1.0], [1.0, 1.0], [-1.0, 1.0]])
+QUAD_POINTS = QUAD_CORNERS / np.sqrt(3.0)
+TRIANGLE_SHAPES = np.array([[0.5, 0.5, 0.0], [0.0, 0.5, 0.5], [0.5, 0.0, 0.5]])
+
+
+def beam_load_kind(value):
+    kind = str(value).strip().upper()
+    if kind not in BEAM_LOAD_TYPES:
+        raise ValueError("Not supported beam load type: {}".format(kind))
+    return BEAM_LOAD_TYPES.index(kind)
+
+
+def eccentricity(record):
+    i_end = float(str(record.i_end) or 0.0)
+    j_end = float(str(record.j_end) or 0.0) if str(record.b_j_end) == "YES" else i_end
+    return DIRECTION_TYPE_TUPLE.index(str(record.ecc_dir).strip().upper()), i_end, j_end
+
+
+def record_column(records, fields, field):
+    return list(map(itemgetter(fields.index(field)), records))
+
+
+def beam_load_rows(beam_loads):
+    records = [getattr(x, "_dataset", x) for x in beam_loads]
+    ids, rows = id_list_rows(records)
+    types = [str(x) for x in record_column(records, Beam_load.fields, "type")]
+    codes = {x: beam_load_kind(x) for x in set(types)}
+    kinds = np.array([codes[x] for x in types], dtype=np.int64)
+    directions = np.array(
+        [int(x) for x in record_column(records, Beam_load.fields, "diretion")], dtype=np.int64
+    )
+    projected = np.array([int(x) for x in record_column(records, Beam_load.fields, "b_proj")], dtype=bool)
+    stations = np.array(
+        [record_column(records, Beam_load.fields, x) for x in STATION_FIELDS], dtype=np.float64
+    ).T.reshape(-1, 4, 2)
+    eccentric = np.zeros((len(records), 3))
+    eccentric[:, 0] = -1
+    flags = np.array([int(x) for x in record_column(records, Beam_load.fields, "b_ecc")], dtype=bool)
+    for i in np.flatnonzero(flags):
+        eccentric[i] = eccentricity(records[i])
+    return ids, kinds[rows], directions[rows], projected[rows], stations[rows], eccentric[rows]
+
+
+def pressure_direction(value):
+    direction = str(value).strip().upper()
+    if direction not in PRESSURE_DIRECTIONS:
+        raise ValueError("Not supported pressure direction: {}".format(direction))
+    return PRESSURE_DIRECTIONS.index(direction)
+
+
+def pressure_rows(pressures):
+    records = [getattr(x, "_dataset", x) for x in pressures]
+    targets = set(zip(
+        record_column(records, Pressure.fields, "e_type"),
+        record_column(records, Pressure.fields, "l_type")
+    ))
+    for e_type, l_type in targets:
+        if (str(e_type), str(l_type)) != ("PLATE", "FACE"):
+            raise ValueError("Not supported pressure: {} {}".format(e_type, l_type))
+    ids, rows = id_list_rows(records)
+    names = [str(x) for x in record_column(records, Pressure.fields, "direction")]
+    codes = {x: pressure_direction(x) for x in set(names)}
+    directions = np.array([codes[x] for x in names], dtype=np.int64)
+    vectors = np.array(
+        [record_column(records, Pressure.fields, x) for x in ("vx", "vy", "vz")],
+        dtype=np.float64
+    ).T.reshape(-1, 3)
+    projected = np.array(
+        [int(x) for x in record_column(records, Pressure.fields, "b_proj")], dtype=bool
+    )
+    corners = np.array(
+        [record_column(records, Pressure.fields, x) for x in CORNER_FIELDS], dtype=np.float64
+    ).T.reshape(-1, 4)
+    uniform = ~corners.any(axis=1)
+    corners[uniform] = np.array(
+        record_column(records, Pressure.fields, "value"), dtype=np.float64
+    )[uniform, None]
+    return ids, directions[rows], vectors[rows], projected[rows], corners[rows]
+
+
+def surface_samples(points):
+    if points.shape[1] == 3:
+        areas = 0.5 * np.cross(points[:, 1] - points[:, 0], points[:, 2] - points[:, 0])
+        return TRIANGLE_SHAPES, np.repeat(areas[:, None] / 3.0, 3, axis=1)
+    xi, eta = QUAD_POINTS[:, 0, None], QUAD_POINTS[:, 1, None]
+    a, b = QUAD_CORNERS[:, 0], QUAD_CORNERS[:, 1]
+    shapes = 0.25 * (1 + xi * a) * (1 + eta * b)
+    tangents = [
+        np.einsum("gk,nkc->ngc", 0.25 * a * (1 + eta * b), points),
+        np.einsum("gk,nkc->ngc", 0.25 * b * (1 + xi * a), points)
+    ]
+    return shapes, np.cross(*tangents)
+
+
+def plate_axes(points):
+    normals, _ = unit_vectors(np.cross(points[:, 2] - points[:, 0], points[:, -1] - points[:, 1]))
+    x, _ = unit_vectors(points[:, 1] - points[:, 0])
+    y = np.cross(normals, x)
+    return np.stack([np.cross(y, normals), y, normals], axis=1)
+
+
+def pressure_nodal_loads(points, directions, vectors, projected, corners):
+    shapes, areas = surface_samples(points)
+    values = corners[:, :points.shape[1]].dot(shapes.T)
+    axes = plate_axes(points)
+    loaded = np.where(
+        (directions < 3)[:, None], GLOBAL_AXES[directions % 3], axes[np.arange(len(points)), directions % 3]
+    )
+    loaded[directions == 6] = unit_vectors(vectors[directions == 6])[0]
+    sizes = np.sqrt((areas ** 2).sum(axis=-1))
+    shrink = projected & (directions < 3)
+    sizes[shrink] = np.abs((areas[shrink] * loaded[shrink, None]).sum(axis=-1))
+    samples = np.where(
+        (directions == 5)[:, None, None], areas, sizes[..., None] * loaded[:, None]
+    ) * values[..., None]
+    return np.einsum("gk,ngc->nkc", shapes, samples)
+
+
+def station_samples(concentrated, stations):
+    d, p = stations[..., 0], stations[..., 1]
+    spans = np.maximum(d[:, 1:] - d[:, :-1], 0.0)[..., None]
+    xi = (d[:, :-1, None] + spans * GAUSS_POINTS).reshape(len(d), -1)
+    values = (p[:, :-1, None] + (p[:, 1:] - p[:, :-1])[..., None] * GAUSS_POINTS).reshape(len(d), -1)
+    weights = (spans * GAUSS_WEIGHTS).reshape(len(d), -1)
+    pad = np.zeros((len(d), xi.shape[1] - d.shape[1]))
+    return (
+        np.where(concentrated[:, None], np.hstack([d, pad]), xi),
+        np.where(concentrated[:, None], np.hstack([np.ones_like(d), pad]), weights),
+        np.where(concentrated[:, None], np.hstack([p, pad]), values)
+    )
+
+
+def hermite(xi, lengths):
+    L = lengths[:, None]
+    shapes = np.stack([
+        1 - 3 * xi ** 2 + 2 * xi ** 3,
+        L * (xi - 2 * xi ** 2 + xi ** 3),
+        3 * xi ** 2 - 2 * xi ** 3,
+        L * (xi ** 3 - xi ** 2)
+    ], axis=-1)
+    slopes = np.stack([
+        (6 * xi ** 2 - 6 * xi) / L,
+        1 - 4 * xi + 3 * xi ** 2,
+        (6 * xi - 6 * xi ** 2) / L,
+        3 * xi ** 2 - 2 * xi
+    ], axis=-1)
+    return shapes, slopes
+
+
+def split_axial(vectors, x):
+    axial = (vectors * x[:, None]).sum(axis=-1)
+    return axial, vectors - axial[..., None] * x[:, None]
+
+
+def fixed_end_loads(lengths, axes, kinds, directions, projected, stations, eccentric):
+    concentrated = kinds < 2
+    moments = kinds % 2 == 1
+    x = axes[:, 0]
+    frames = np.where((directions < 3)[:, None, None], GLOBAL_AXES, axes)
+    vectors = frames[np.arange(len(kinds)), directions % 3]
+    scale = np.where(concentrated, 1.0, lengths)
+    shrink = projected & ~concentrated & (directions < 3)
+    scale[shrink] *= np.sqrt(np.clip(1.0 - (vectors[shrink] * x[shrink]).sum(axis=1) ** 2, 0.0, 1.0))
+    xi, weights, values = station_samples(concentrated, stations)
+    samples = (weights * values * scale[:, None])[..., None] * vectors[:, None]
+    forces = np.where(moments[:, None, None], 0.0, samples)
+    couples = np.where(moments[:, None, None], samples, 0.0)
+    offsets = np.where((eccentric[:, 0] < 3)[:, None, None], GLOBAL_AXES, axes)[
+        np.arange(len(kinds)), eccentric[:, 0].astype(np.int64) % 3
+    ] * (eccentric[:, 0] >= 0)[:, None]
+    arms = eccentric[:, 1, None] + (eccentric[:, 2] - eccentric[:, 1])[:, None] * xi
+    couples = couples + np.cross(arms[..., None] * offsets[:, None], forces)
+    shapes, slopes = hermite(xi, lengths)
+    axial, transverse = split_axial(forces, x)
+    twist, bending = split_axial(couples, x)
+    levers = np.cross(x[:, None], transverse)
+    kicks = np.cross(bending, x[:, None])
+    ends = np.zeros((len(kinds), 2, 6))
+    for end, linear in enumerate((1.0 - xi, xi)):
+        ends[:, end, :3] = (
+            (linear * axial)[..., None] * x[:, None]
+            + shapes[..., 2 * end, None] * transverse
+            + slopes[..., 2 * end, None] * kicks
+        ).sum(axis=1)
+        ends[:, end, 3:] = (
+            (linear * twist)[..., None] * x[:, None]
+            + shapes[..., 2 * end + 1, None] * levers
+            + slopes[..., 2 * end + 1, None] * bending
+        ).sum(axis=1)
+    return ends
+
+
+class Equivalent_loads(object):
+    def __init__(self, nodes, elements):
+        self.node_ids, self.coordinates = node_arrays(nodes)
+        index = Sorted_index(self.node_ids)
+        elements = columnar_elements(elements)
+        lines = elements.lines
+        self.line_ids = lines.ids
+        self._lines = Sorted_index(lines.ids)
+        self.line_nodes = index.positions(lines.nodes[:, :2]).reshape(-1, 2)
+        self.lengths, self.axes = beam_axes(
+            self.coordinates[self.line_nodes[:, 0]],
+            self.coordinates[self.line_nodes[:, 1]],
+            lines.extras["angle"]
+        )
+        plates = elements.plates
+        self.plate_ids = plates.ids
+        self._plates = Sorted_index(plates.ids)
+        self.triangles = plates.nodes[:, 3] <= 0
+        corners = np.where(self.triangles[:, None], plates.nodes[:, [0, 1, 2, 0]], plates.nodes)
+        self.plate_nodes = index.positions(corners).reshape(-1, 4)
+
+    def __repr__(self):
+        return "<Equivalent_loads:{}nodes {}lines {}plates>".format(
+            len(self.node_ids), len(self.line_ids), len(self.plate_ids)
+        )
+
+    def beam_loads(self, beam_loads):
+        ids, kinds, directions, projected, stations, eccentric = beam_load_rows(beam_loads)
+        positions = self._lines.positions(ids)
+        ends = fixed_end_loads(
+            self.lengths[positions], self.axes[positions],
+            kinds, directions, projected, stations, eccentric
+        )
+        return accumulate(self.line_nodes[positions].ravel(), ends.reshape(-1, 6))
+
+    def pressures(self, pressures):
+        ids, directions, vectors, projected, corners = pressure_rows(pressures)
+        positions = self._plates.positions(ids)
+        triangles = self.triangles[positions]
+        parts = []
+        for mask, count in ((triangles, 3), (~triangles, 4)):
+            nodes = self.plate_nodes[positions[mask], :count]
+            parts.append((nodes.ravel(), pressure_nodal_loads(
+                self.coordinates[nodes], directions[mask], vectors[mask],
+                projected[mask], corners[mask]
+            ).reshape(-1, 3)))
+        forces = np.concatenate([x[1] for x in parts])
+        return accumulate(
+            np.concatenate([x[0] for x in parts]),
+            np.hstack([forces, np.zeros_like(forces)])
+        )
+
+    def apply(self, nodal_loads, load_case, block):
+        convert = {BEAM_LOAD_KEY: self.beam_loads, PRESSURE_KEY: self.pressures}[block.key]
+        nodal_loads.merge(load_case, *convert(block))
+        return nodal_loads
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(model["NODE"], model["ELEMENT"])
+
+
+def equivalent_nodal_loads(model):
+    nodal_loads = Nodal_loads.from_model(model)
+    converter = Equivalent_loads.from_model(model)
+    for load_case, blocks in model.loads.items():
+        for key in (BEAM_LOAD_KEY, PRESSURE_KEY):
+            if key in blocks:
+                converter.apply(nodal_loads, load_case, blocks[key])
+    return nodal_loads
+
+
+if __name__ == "__main__":
+    from models import Model
+
+    model = Model.from_lines([
+        "*NODE",
+        "1, 0.0, 0.0, 0.0",
+        "2, 6.0, 0.0, 0.0",
+        "3, 6.0, 0.0, 4.0",
+        "4, 6.0, 5.0, 4.0",
+        "5, 0.0, 5.0, 4.0",
+        "6, 0.0, 0.0, 4.0",
+        "7, 6.0, 8.0, 4.0",
+        "*ELEMENT",
+        "1, BEAM, 1, 1, 1, 2, 0, 0",
+        "2, BEAM, 1, 1, 2, 3, 0, 0",
+        "3, PLATE, 1, 1, 6, 3, 4, 5, 1, 0, ",
+        "4, PLATE, 1, 1, 4, 7, 5, 0, 1, 0, ",
+        "*USE-STLD, DL",
+        "*BEAMLOAD",
+        "1, BEAM, UNILOAD, GZ, NO, NO, aDir[1], , , , 0, -10, 1, -10, 0, 0, 0, 0, , NO, 0, 0, NO",
+        "1, BEAM, CONLOAD, GZ, NO, NO, aDir[1], , , , 0.5, -30, 0, 0, 0, 0, 0, 0, , NO, 0, 0, NO",
+        "*USE-STLD, WX",
+        "*CONLOAD",
+        "3, 5, 0, 0, 0, 0, 0, ",
+        "*BEAMLOAD",
+        "2, BEAM, UNILOAD, GX, NO, NO, aDir[1], , , , 0, 0, 1, 6, 0, 0, 0, 0, , NO, 0, 0, NO",
+        "2, BEAM, CONMOMENT, GY, NO, NO, aDir[1], , , , 0.5, 8, 0, 0, 0, 0, 0, 0, , NO, 0, 0, NO",
+        "1, BEAM, CONLOAD, GZ, NO, YES, GY, 0.2, 0.4, YES, 0.25, -4, 0, 0, 0, 0, 0, 0, , NO, 0, 0, NO",
+        "*USE-STLD, SDL",
+        "*PRESSURE",
+        "3, PRES, PLATE, FACE, GZ, 0, 0, 0, NO, -2, 0, 0, 0, 0, ",
+        "4, PRES, PLATE, FACE, LZ, 0, 0, 0, NO, 0, -1, -2, -3, 0, "
+    ])
+    loads = equivalent_nodal_loads(model)
+    print(Equivalent_loads.from_model(model))
+    for load_case in loads:
+        print(load_case)
+        for node_id, values in sorted(zip(loads.node_ids.tolist(), loads.matrix(load_case))):
+            print(node_id, values)
+        print(loads.resultant(load_case))
@@ -1,7 +1,25 @@
-from utils import grouping_continuous_int
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import chain
+
+from utils import (
+    canonical_run,
+    run_count,
+    run_ids,
+    encode_runs,
+    normalize_runs,
+    union_runs,
+    intersect_runs,
+    subtract_runs
+)
 from common import *
 
 class Field_factory(object):
+    decode_source = None
+    check_source = None
+    member_source = None
+    encode_source = None
+
     def __init__(self, value):
         self.value = self._constructor(value)
 
@@ -17,6 +35,16 @@ class Field_factory(object):
     def _constructor(self):
         raise NotImplementedError
 
+    @classmethod
+    def decode(cls, value):
+        return cls._constructor.__func__(cls, value)
+
+    @classmethod
+    def encode(cls, value):
+        field = cls.__new__(cls)
+        field.value = value
+        return field.__str__()
+
     def __add__(self, other):
         if isinstance(other, Field_factory):
             return self.__class__(self.value + other.value)
@@ -29,6 +57,9 @@ class Field_factory(object):
 
 
 class Stripped_str(Field_factory):
+    decode_source = "{value}.strip()"
+    encode_source = "{value}"
+
     def __str__(self):
         return self.value
 
@@ -56,6 +87,11 @@ class Keyword(Field_factory):
 
 class Natural_number(Field_factory):
     limit = 0
+    decode_source = "int({value})"
+    check_source = "{value} > {cls}.limit"
+    encode_source = "{value}"
+    check_message = "This field can define only natural number"
+
     def __str__(self):
         return str(self.value)
 
@@ -68,7 +104,7 @@ class Natural_number(Field_factory):
     def _constructor(self, value):
         if int(value) > self.limit:
             return int(value)
-        raise ValueError("This field can define only natural number")
+        raise ValueError(self.check_message)
 
 
 class Positive_integer(Natural_number):
@@ -80,6 +116,8 @@ class Mgt_flag(Field_factory):
         "YES": True,
         "NO": False
     }
+    decode_source = "{cls}.ref_dict[{value}.strip()]"
+    encode_source = '("YES" if {value} else "NO")'
 
     def __str__(self):
         return "YES" if self.value else "NO"
@@ -136,75 +174,135 @@ class Dof_flags(Field_factory):
     @staticmethod
     def _sequence_to_flags(seq):
         if len(seq) == 6:
-            return tuple(bool(x) for x in seq)
+            return tuple(bool(int(x)) for x in seq)
         if len(seq) < 6:
             return tuple(True if (x + 1 in seq) else False for x in range(6))
         raise ValueError("{} not match  DoF flag".format(seq))
 
 
+class Id_runs(tuple):
+    __slots__ = ()
+
+
 class Id_list(Field_factory):
+    decode_source = "{cls}._list_expression_to_runs({value})"
+
     @property
     def grouped_ids(self):
-        return grouping_continuous_int(self.value)
+        return [list(run_ids(x)) for x in self.value]
+
+    @property
+    def runs(self):
+        return self.value
 
     def __str__(self):
-        return " ".join([self._list_to_num_expression(x) for x in self.grouped_ids])
+        return " ".join([self._run_to_num_expression(x) for x in self.value])
 
     def __repr__(self):
         return "ID[{}]".format(self.__str__())
 
     def __iter__(self):
-        return iter(self.value)
+        return chain.from_iterable(run_ids(x) for x in self.value)
+
+    def __len__(self):
+        return self._offsets[-1]
+
+    def __contains__(self, item_id):
+        idx = bisect_right(self._starts, item_id) - 1
+        if idx < 0:
+            return False
+        start, end, step = self.value[idx]
+        return item_id <= end and (item_id - start) % step == 0
 
     def __getitem__(self, idx):
-        return self.value[idx]
+        if isinstance(idx, slice):
+            return list(self)[idx]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("Id_list index out of range")
+        run_idx = bisect_right(self._offsets, idx) - 1
+        return self.value[run_idx][0] + (idx - self._offsets[run_idx]) * self.value[run_idx][2]
+
+    def __add__(self, other):
+        return self.union(other)
+
+    def __or__(self, other):
+        return self.union(other)
+
+    def __and__(self, other):
+        return self.intersection(other)
+
+    def __sub__(self, other):
+        return self.difference(other)
+
+    @property
+    def _starts(self):
+        if "_start_cache" not in self.__dict__:
+            self._start_cache = [x[0] for x in self.value]
+        return self._start_cache
+
+    @property
+    def _offsets(self):
+        if "_offset_cache" not in self.__dict__:
+            offsets = [0]
+            for run in self.value:
+                offsets.append(offsets[-1] + run_count(run))
+            self._offset_cache = offsets
+        return self._offset_cache
+
+    def union(self, other):
+        return self.__class__(Id_runs(union_runs(self.value, Id_list(other).value)))
+
+    def intersection(self, other):
+        return self.__class__(Id_runs(intersect_runs(self.value, Id_list(other).value)))
+
+    def difference(self, other):
+        return self.__class__(Id_runs(subtract_runs(self.value, Id_list(other).value)))
 
     def _constructor(self, value):
-        if isinstance(value, int):
-            return [value]
+        if isinstance(value, Id_runs):
+            return value
+        elif isinstance(value, Id_list):
+            return value.value
+        elif isinstance(value, int):
+            return Id_runs([(value, value, 1)])
         elif isinstance(value, str):
-            return self._list_expression_to_ids(value)
+            return self._list_expression_to_runs(value)
         elif hasattr(value, "__iter__"):
-            return [int(x) for x in value]
+            return Id_runs(encode_runs(sorted(set(int(x) for x in value))))
         else:
             raise ValueError("Cannot convert id list.")
 
     @staticmethod
-    def __num_expression_to_ids(text):
+    def _num_expression_to_run(text):
+        if text.isdigit():
+            return int(text), int(text), 1
         split_by_to = text.split("to")
         start = int(split_by_to[0])
         if split_by_to[1].isdigit():
-            end = int(split_by_to[1])
-            step = 1
-        else:
-            split_by_by = split_by_to[1].split("by")
-            end = int(split_by_by[0])
-            step = int(split_by_by[1])
-        return list(range(start, end + 1, step))
+            return canonical_run(start, int(split_by_to[1]))
+        split_by_by = split_by_to[1].split("by")
+        return canonical_run(start, int(split_by_by[0]), int(split_by_by[1]))
 
     @staticmethod
-    def __text_to_ids(text):
+    def _list_expression_to_runs(text):
+        text = text.strip()
         if text.isdigit():
-            return [int(text)]
-        else:
-            return Id_list.__num_expression_to_ids(text)
-
-    @staticmethod
-    def _list_expression_to_ids(text):
-        splitted = text.split()
-        ids = [Id_list.__text_to_ids(x) for x in splitted]
-        return sum(ids, [])
+            return Id_runs([(int(text), int(text), 1)])
+        runs = [Id_list._num_expression_to_run(x) for x in text.split()]
+        return Id_runs(normalize_runs(runs))
 
     @staticmethod
-    def _list_to_num_expression(values):
-        if values:
-            if len(values) == 1:
-                return str(values[0])
-            elif len(values) == 2:
-                return " ".join(map(str, values))
-            else:
-                return "{}to{}".format(values[0], values[-1])
-        raise ValueError("Not included value.")
+    def _run_to_num_expression(run):
+        start, end, step = run
+        if start == end:
+            return str(start)
+        elif start + step == end:
+            return "{} {}".format(start, end)
+        elif step == 1:
+            return "{}to{}".format(start, end)
+        return "{}to{}by{}".format(start, end, step)
 
 
 class Load_case_dict(Field_factory):
@@ -229,14 +327,72 @@ class Load_case_dict(Field_factory):
         if isinstance(value, dict):
             return value
         elif hasattr(value, "__iter__"):
-            names = [x for x in range(0, len(value), 2)]
-            factors = [float(x) for x in range(1, len(value), 2)]
-            return {k: v for k, v in zip(names, factors)}
-        raise ValueError("")
+            values = self._strip_trailing_blanks(value)
+            if len(values) % 2:
+                raise ValueError("{} not match load case and factor pairs.".format(value))
+            names = [str(x).strip() for x in values[0::2]]
+            factors = [float(x) for x in values[1::2]]
+            return OrderedDict(zip(names, factors))
+        raise ValueError("{} cannot convert load case dict.".format(value))
+
+    @staticmethod
+    def _strip_trailing_blanks(value):
+        values = list(value)
+        while values and not str(values[-1]).strip():
+            values.pop()
+        return values
+
+
+class Combination_case_dict(Load_case_dict):
+    def __str__(self):
+        return ", ".join(["{}, {}, {}".format(k[0], k[1], v) for k, v in self.value.items()])
+
+    def __repr__(self):
+        return "LC[{}]".format(
+            " ".join(["{}:{}{}".format(k[0], k[1], v) for k, v in self.value.items()])
+        )
+
+    def _constructor(self, value):
+        if isinstance(value, dict):
+            return OrderedDict(
+                (k if isinstance(k, tuple) else ("ST", k), v) for k, v in value.items()
+            )
+        elif hasattr(value, "__iter__"):
+            values = self._strip_trailing_blanks(value)
+            if len(values) % 3:
+                raise ValueError("{} not match analysis, load case and factor.".format(value))
+            factors = OrderedDict()
+            for kind, name, factor in zip(values[0::3], values[1::3], values[2::3]):
+                key = (str(kind).strip(), str(name).strip())
+                factors[key] = factors.get(key, 0.0) + float(factor)
+            return factors
+        raise ValueError("{} cannot convert combination case dict.".format(value))
+
+
+class Index_with_tuple_Meta(type):
+    def __new__(cls, name, bases, d):
+        index_class = type.__new__(cls, name, bases, d)
+        index_class.ref_dict = {x: i for i, x in enumerate(index_class.ref_tuple)}
+        index_class.members = tuple([
+            index_class.create_member(i) for i in range(len(index_class.ref_tuple))
+        ])
+        return index_class
 
 
 class Index_with_tuple(Field_factory):
+    __metaclass__ = Index_with_tuple_Meta
     ref_tuple = ()
+    ref_dict = {}
+    members = ()
+    decode_source = "{cls}.ref_dict[{value}.strip()]"
+    member_source = "{cls}.members[{value}]"
+    encode_source = "{cls}.ref_tuple[{value}]"
+
+    def __new__(cls, value):
+        return cls.members[cls.decode(value)]
+
+    def __init__(self, value):
+        pass
 
     def __str__(self):
         return self.ref_tuple[self.value]
@@ -247,13 +403,29 @@ class Index_with_tuple(Field_factory):
     def __float__(self):
         return float(self.value)
 
+    def __reduce__(self):
+        return self.__class__, (self.value,)
+
     def _constructor(self, value):
         if isinstance(value, int):
-            return value
-        if isinstance(value, str):
-            return self.ref_tuple.index(value.strip())
+            if 0 <= value < len(self.ref_tuple):
+                return value
+        elif isinstance(value, str):
+            code = self.ref_dict.get(value.strip())
+            if code is not None:
+                return code
         raise KeyError("There is not {} in reference.".format(value))
 
+    @classmethod
+    def create_member(cls, code):
+        member = object.__new__(cls)
+        member.value = code
+        return member
+
+    @classmethod
+    def encode(cls, value):
+        return cls.ref_tuple[value]
+
 
 class Element_type(Index_with_tuple):
     ref_tuple = ELEMENT_TYPE_TUPLE
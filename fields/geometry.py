@@ -0,0 +1,99 @@
+import numpy as np
+
+from columnar import Sorted_index, node_arrays, columnar_elements
+
+GLOBAL_X = np.array([1.0, 0.0, 0.0])
+GLOBAL_Z = np.array([0.0, 0.0, 1.0])
+VERTICAL_TOLERANCE = 1e-9
+
+
+def unit_vectors(vectors):
+    norms = np.sqrt((vectors ** 2).sum(axis=-1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return vectors / norms[..., None], norms
+
+
+def beam_axes(starts, ends, angles=None):
+    x, lengths = unit_vectors(np.asarray(ends, dtype=np.float64) - starts)
+    vertical = np.hypot(x[:, 0], x[:, 1]) < VERTICAL_TOLERANCE
+    y, _ = unit_vectors(np.cross(GLOBAL_Z, x))
+    y[vertical] = np.cross(GLOBAL_X, x[vertical])
+    z = np.cross(x, y)
+    if angles is not None:
+        beta = np.radians(np.asarray(angles, dtype=np.float64))[:, None]
+        y, z = np.cos(beta) * y + np.sin(beta) * z, np.cos(beta) * z - np.sin(beta) * y
+    return lengths, np.stack([x, y, z], axis=1)
+
+
+def plate_geometry(p1, p2, p3, p4):
+    normals, areas = unit_vectors(0.5 * np.cross(p3 - p1, p4 - p2))
+    first = 0.5 * np.sqrt((np.cross(p2 - p1, p3 - p1) ** 2).sum(axis=1))
+    second = 0.5 * np.sqrt((np.cross(p3 - p1, p4 - p1) ** 2).sum(axis=1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centroids = (
+            first[:, None] * (p1 + p2 + p3) + second[:, None] * (p1 + p3 + p4)
+        ) / (3.0 * (first + second))[:, None]
+    return areas, centroids, normals
+
+
+class Element_geometry(object):
+    def __init__(self, nodes, elements):
+        node_ids, coordinates = node_arrays(nodes)
+        index = Sorted_index(node_ids)
+        elements = columnar_elements(elements)
+        lines = elements.lines
+        self.line_ids = lines.ids
+        starts = coordinates[index.positions(lines.nodes[:, 0])]
+        ends = coordinates[index.positions(lines.nodes[:, 1])]
+        self.lengths, self.axes = beam_axes(starts, ends, lines.extras["angle"])
+        self.midpoints = 0.5 * (starts + ends)
+        plates = elements.plates
+        corners = plates.nodes.copy()
+        corners[:, 3] = np.where(corners[:, 3] > 0, corners[:, 3], corners[:, 0])
+        points = coordinates[index.positions(corners)].reshape(-1, 4, 3)
+        self.plate_ids = plates.ids
+        self.areas, self.centroids, self.normals = plate_geometry(
+            *[points[:, i] for i in range(4)]
+        )
+
+    def __repr__(self):
+        return "<Element_geometry:{}lines {}plates>".format(
+            len(self.line_ids), len(self.plate_ids)
+        )
+
+    @property
+    def direction_cosines(self):
+        return self.axes[:, 0]
+
+    @property
+    def total_length(self):
+        return self.lengths.sum()
+
+    @property
+    def total_area(self):
+        return self.areas.sum()
+
+
+if __name__ == "__main__":
+    from columnar import Columnar_nodes, Columnar_elements
+
+    nodes = Columnar_nodes.from_lines([
+        "1, 0.0, 0.0, 0.0",
+        "2, 0.0, 0.0, 3.0",
+        "3, 4.0, 0.0, 3.0",
+        "4, 4.0, 2.0, 3.0",
+        "5, 0.0, 2.0, 3.0"
+    ])
+    elements = Columnar_elements.from_lines([
+        "1, BEAM, 1, 1, 1, 2, 0, 0",
+        "2, BEAM, 1, 1, 2, 3, 90, 0",
+        "3, PLATE, 1, 1, 2, 3, 4, 5, 1, 0, ",
+        "4, PLATE, 1, 1, 2, 3, 4, 0, 1, 0, "
+    ])
+    geometry = Element_geometry(nodes, elements)
+    print(geometry)
+    print(geometry.lengths)
+    print(geometry.axes)
+    print(geometry.areas)
+    print(geometry.centroids)
+    print(geometry.normals)
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from columnar import Sorted_index, node_arrays, id_list_rows
+
+NODAL_LOAD_FIELDS = ("fx", "fy", "fz", "mx", "my", "mz")
+NODAL_LOAD_KEY = "CONLOAD"
+
+
+def accumulate(positions, values):
+    values = np.asarray(values, dtype=np.float64).reshape(len(positions), -1)
+    unique, inverse = np.unique(positions, return_inverse=True)
+    summed = np.column_stack([
+        np.bincount(inverse, weights=x, minlength=len(unique)) for x in values.T
+    ]) if len(unique) else values[:0]
+    return unique, summed
+
+
+def nodal_load_rows(node_index, concentrated_loads):
+    items = list(concentrated_loads)
+    if not items:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, len(NODAL_LOAD_FIELDS)))
+    ids, rows = id_list_rows(items)
+    values = np.array([
+        [getattr(x, f) for f in NODAL_LOAD_FIELDS] for x in items
+    ], dtype=np.float64)
+    return accumulate(node_index.positions(ids), values[rows])
+
+
+def resultant(coordinates, positions, values, point=(0.0, 0.0, 0.0)):
+    forces = values[:, :3]
+    arms = coordinates[positions] - np.asarray(point, dtype=np.float64)
+    moments = values[:, 3:].sum(axis=0) + np.cross(arms, forces).sum(axis=0)
+    return np.concatenate([forces.sum(axis=0), moments])
+
+
+class Nodal_loads(object):
+    def __init__(self, nodes, load_cases=None):
+        self.node_ids, self.coordinates = node_arrays(nodes)
+        self._index = Sorted_index(self.node_ids)
+        self.loads = OrderedDict()
+        for load_case, block in (load_cases or {}).items():
+            self.add_case(load_case, block)
+
+    def __repr__(self):
+        return "<Nodal_loads:{}nodes {}load cases>".format(
+            len(self.node_ids), len(self.loads)
+        )
+
+    def __contains__(self, load_case):
+        return load_case in self.loads
+
+    def __iter__(self):
+        return iter(self.loads)
+
+    def add_case(self, load_case, concentrated_loads):
+        self.loads[load_case] = nodal_load_rows(self._index, concentrated_loads)
+
+    def merge(self, load_case, positions, values):
+        if load_case in self.loads:
+            positions = np.concatenate([self.loads[load_case][0], positions])
+            values = np.concatenate([self.loads[load_case][1], values])
+        self.loads[load_case] = accumulate(positions, values)
+
+    def matrix(self, load_case):
+        positions, values = self.loads[load_case]
+        matrix = np.zeros((len(self.node_ids), len(NODAL_LOAD_FIELDS)))
+        matrix[positions] = values
+        return matrix
+
+    def loaded_nodes(self, load_case):
+        return self.node_ids[self.loads[load_case][0]]
+
+    def resultant(self, load_case, point=(0.0, 0.0, 0.0)):
+        return resultant(self.coordinates, *self.loads[load_case], point=point)
+
+    def resultants(self, point=(0.0, 0.0, 0.0)):
+        return OrderedDict((x, self.resultant(x, point)) for x in self.loads)
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(model["NODE"], OrderedDict(
+            (k, v[NODAL_LOAD_KEY]) for k, v in model.loads.items() if NODAL_LOAD_KEY in v
+        ))
+
+
+if __name__ == "__main__":
+    from models import Model
+
+    model = Model.from_lines([
+        "*NODE",
+        "1, 0.0, 0.0, 0.0",
+        "2, 0.0, 0.0, 3.0",
+        "3, 4.0, 0.0, 3.0",
+        "*USE-STLD, DL",
+        "*CONLOAD",
+        "2 3, 0, 0, -10, 0, 0, 0, ",
+        "3, 0, 0, -5, 0, 0, 0, ",
+        "*USE-STLD, WX",
+        "*CONLOAD",
+        "2, 20, 0, 0, 0, 0, 0, "
+    ])
+    loads = Nodal_loads.from_model(model)
+    print(loads)
+    print(loads.matrix("DL"))
+    print(loads.loaded_nodes("DL"))
+    for load_case, values in loads.resultants().items():
+        print(load_case, values)
@@ -0,0 +1,199 @@
+from copy import copy
+from itertools import product
+
+import numpy as np
+
+from columnar import (
+    Columnar_nodes,
+    Columnar_elements,
+    Line_element_table,
+    Plate_element_table,
+    node_arrays
+)
+from datasets import Dataset_base
+from fields import Id_list
+
+DEFAULT_TOLERANCE = 1e-3
+MAX_PACKED_CELLS = 2 ** 62
+NODE_FIELDS = {x.item_type: x.node_fields for x in (Line_element_table, Plate_element_table)}
+ID_LIST_KEYS = ("CONSTRAINT", "CONLOAD", "NDTEMPER")
+ADDITIVE_KEYS = ("CONLOAD",)
+
+
+def coincident_pairs(coordinates, tolerance=DEFAULT_TOLERANCE):
+    coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)
+    empty = np.zeros(0, dtype=np.int64)
+    if len(coordinates) < 2:
+        return empty, empty
+    keys = np.floor(coordinates / tolerance).astype(np.int64)
+    axes = [np.unique(x) for x in keys.T]
+    if np.prod([float(len(x)) for x in axes]) >= MAX_PACKED_CELLS:
+        raise ValueError("Too many cells for this tolerance.")
+    ranks = [np.searchsorted(axis, column) for axis, column in zip(axes, keys.T)]
+    cells = (ranks[0] * len(axes[1]) + ranks[1]) * len(axes[2]) + ranks[2]
+    order = np.argsort(cells)
+    sorted_cells = cells[order]
+    neighbours = []
+    for axis, column in zip(axes, keys[order].T):
+        shifted = {}
+        for d in (-1, 0, 1):
+            pos = np.minimum(np.searchsorted(axis, column + d), len(axis) - 1)
+            shifted[d] = pos, axis[pos] == column + d
+        neighbours.append(shifted)
+    firsts, seconds = [], []
+    for offset in product((-1, 0, 1), repeat=3):
+        (px, vx), (py, vy), (pz, vz) = [x[d] for x, d in zip(neighbours, offset)]
+        target = (px * len(axes[1]) + py) * len(axes[2]) + pz
+        lower = np.searchsorted(sorted_cells, target, "left")
+        upper = np.searchsorted(sorted_cells, target, "right")
+        counts = np.where(vx & vy & vz, upper - lower, 0)
+        starts = np.cumsum(counts) - counts
+        first = np.repeat(order, counts)
+        second = order[
+            np.repeat(lower, counts) + np.arange(counts.sum()) - np.repeat(starts, counts)
+        ]
+        keep = first < second
+        firsts.append(first[keep])
+        seconds.append(second[keep])
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    distances = np.sqrt(((coordinates[first] - coordinates[second]) ** 2).sum(axis=1))
+    close = distances <= tolerance
+    return first[close], second[close]
+
+
+def merge_clusters(count, first, second):
+    labels = np.arange(count)
+    while True:
+        low = np.minimum(labels[first], labels[second])
+        merged = labels.copy()
+        np.minimum.at(merged, first, low)
+        np.minimum.at(merged, second, low)
+        merged = merged[merged]
+        if (merged == labels).all():
+            return labels
+        labels = merged
+
+
+def find_duplicates(ids, coordinates, tolerance=DEFAULT_TOLERANCE):
+    ids = np.asarray(ids, dtype=np.int64)
+    order = np.argsort(ids)
+    ids = ids[order]
+    first, second = coincident_pairs(np.asarray(coordinates)[order], tolerance)
+    labels = merge_clusters(len(ids), first, second)
+    removed = labels != np.arange(len(ids))
+    return ids[removed], ids[labels[removed]]
+
+
+def remap_ids(values, removed, survivors):
+    values = np.asarray(values, dtype=np.int64)
+    if not len(removed):
+        return values.copy()
+    pos = np.minimum(np.searchsorted(removed, values), len(removed) - 1)
+    return np.where(removed[pos] == values, survivors[pos], values)
+
+
+def copy_layout(block, source):
+    block.source_header = source.source_header
+    block.trailer = source.trailer
+    return block
+
+
+def drop_nodes(nodes, removed):
+    if isinstance(nodes, Columnar_nodes):
+        keep = ~np.in1d(nodes.ids, removed)
+        return copy_layout(Columnar_nodes(nodes.ids[keep], nodes.coordinates[keep]), nodes)
+    removed = set(removed.tolist())
+    return copy_layout(
+        nodes.__class__([x for x in nodes.items.values() if int(x.id) not in removed]), nodes
+    )
+
+
+def remap_elements(elements, removed, survivors):
+    if isinstance(elements, Columnar_elements):
+        return Columnar_elements(*[
+            x.with_nodes(remap_ids(x.nodes, removed, survivors)) for x in elements.tables
+        ])
+    for item in elements.items.values():
+        fields = NODE_FIELDS[type(item)]
+        old = np.array([int(getattr(item, x)) for x in fields], dtype=np.int64)
+        new = remap_ids(old, removed, survivors)
+        if (old != new).any():
+            item.update(**{f: x for f, x, o in zip(fields, new.tolist(), old) if x != o})
+    return elements
+
+
+def replace_id_list(item, ids):
+    id_list = Id_list(ids.tolist())
+    if isinstance(item, Dataset_base):
+        item.update(id_list=id_list)
+        return item
+    return item._replace(id_list=id_list.value)
+
+
+def occurrence_groups(ids):
+    ids = np.sort(ids, kind="mergesort")
+    ranks = np.arange(len(ids)) - np.searchsorted(ids, ids)
+    return [ids[ranks == x] for x in range(ranks.max() + 1)]
+
+
+def remap_id_list(item, removed, survivors, additive=False):
+    old = np.fromiter(Id_list(item.id_list), dtype=np.int64)
+    new = remap_ids(old, removed, survivors)
+    if (old == new).all():
+        return [item]
+    groups = occurrence_groups(new) if additive else [new]
+    return [replace_id_list(item if i == 0 else copy(item), x) for i, x in enumerate(groups)]
+
+
+def remap_id_lists(block, removed, survivors):
+    additive = block.key in ADDITIVE_KEYS
+    block.items = [
+        y for x in block.items for y in remap_id_list(x, removed, survivors, additive)
+    ]
+    return block
+
+
+def merge_coincident_nodes(model, tolerance=DEFAULT_TOLERANCE):
+    removed, survivors = find_duplicates(*node_arrays(model["NODE"]), tolerance=tolerance)
+    if not len(removed):
+        return removed, survivors
+    model.blocks["NODE"] = drop_nodes(model["NODE"], removed)
+    if "ELEMENT" in model:
+        model.blocks["ELEMENT"] = remap_elements(model["ELEMENT"], removed, survivors)
+    scopes = [model.blocks] + list(model.loads.values())
+    for block in [x[k] for x in scopes for k in ID_LIST_KEYS if k in x]:
+        remap_id_lists(block, removed, survivors)
+    return removed, survivors
+
+
+if __name__ == "__main__":
+    import sys
+
+    from loads import Nodal_loads
+    from models import Model
+
+    model = Model.from_lines([
+        "*NODE    ; Nodes",
+        "1, 0.0, 0.0, 0.0",
+        "2, 0.0, 0.0, 3.0",
+        "3, 4.0, 0.0, 3.0",
+        "4, 0.0, 0.0, 3.0004",
+        "5, 4.0, 0.0, 3.0",
+        "6, 0.0, 0.0, 0.0",
+        "*ELEMENT",
+        "1, BEAM, 1, 1, 1, 2, 0, 0",
+        "2, BEAM, 1, 1, 4, 5, 0, 0",
+        "*CONSTRAINT",
+        "1 6, 111111, ",
+        "*USE-STLD, DL",
+        "*CONLOAD",
+        "2 4 5, 0, 0, -10, 0, 0, 0, ",
+        "*NDTEMPER",
+        "2 4, 20, "
+    ], keep_source=True)
+    before = Nodal_loads.from_model(model).resultants()
+    print(merge_coincident_nodes(model))
+    after = Nodal_loads.from_model(model).resultants()
+    assert all(np.allclose(before[x], after[x]) for x in before)
+    print(after)
+    model.write_to(sys.stdout)
@@ -0,0 +1,412 @@
+import mmap
+import sys
+import tempfile
+from collections import OrderedDict
+from functools import reduce
+
+from fields import Keyword
+from blocks import BLOCK_REGISTRY, WRITE_CHUNK_LINES, Raw_block, write_lines
+from datasets import Source_line
+
+COMMENT_MARK = ";"
+LOAD_CASE_KEY = "USE-STLD"
+END_KEY = "ENDDATA"
+
+
+def strip_comment(line):
+    return line.rstrip("\r\n").split(COMMENT_MARK, 1)[0]
+
+
+def split_header(line):
+    key, _, arg = line.strip().partition(",")
+    return Keyword(key.strip()), arg.strip()
+
+
+def is_header(line):
+    return strip_comment(line).lstrip().startswith("*")
+
+
+def body_lines(lines):
+    stripped = [strip_comment(x) for x in lines]
+    return [x for x in stripped if x.strip()]
+
+
+def source_lines(lines):
+    body = []
+    trivia = []
+    for line in lines:
+        raw = line.rstrip("\r\n")
+        stripped = strip_comment(raw)
+        if not stripped.strip():
+            trivia.append(raw)
+            continue
+        body.append(Source_line(stripped, "\n".join(trivia + [raw])))
+        trivia = []
+    return body, trivia
+
+
+def find_headers(data):
+    headers = []
+    position = data.find(b"*")
+    while position != -1:
+        start = data.rfind(b"\n", 0, position) + 1
+        end = data.find(b"\n", position)
+        end = len(data) if end == -1 else end
+        if not data[start:position].strip():
+            headers.append((start, end))
+        position = data.find(b"*", end)
+    return headers
+
+
+def parse_block(block_class, lines, processes=None, keep_source=False):
+    kwargs = {}
+    if processes and block_class.parallel:
+        kwargs["processes"] = processes
+    if keep_source and block_class.verbatim:
+        kwargs["keep_source"] = True
+    return block_class.from_lines(lines, **kwargs)
+
+
+def section_block(block_class, key, header, lines, processes=None, keep_source=False):
+    if block_class is None:
+        return Raw_block([x.rstrip("\r\n") for x in lines], key, header.rstrip("\r\n"))
+    if not keep_source:
+        return parse_block(block_class, body_lines(lines), processes)
+    body, trailer = source_lines(lines)
+    block = parse_block(block_class, body, processes, keep_source)
+    block.source_header = header.rstrip("\r\n")
+    block.trailer = trailer
+    return block
+
+
+def iter_sections(lines):
+    header = None
+    body = []
+    for line in lines:
+        if is_header(line):
+            yield header, body
+            header, body = line, []
+        else:
+            body.append(line)
+    yield header, body
+
+
+def iter_blocks(lines, registry=BLOCK_REGISTRY, processes=None, keep_source=False,
+                layout=None):
+    load_case = None
+    for header, body in iter_sections(lines):
+        if header is None:
+            if layout is not None and keep_source:
+                layout.preamble = [x.rstrip("\r\n") for x in body]
+            continue
+        key, arg = split_header(strip_comment(header))
+        if key == LOAD_CASE_KEY:
+            load_case = arg
+            if layout is not None:
+                layout.add_load_case(load_case, header.rstrip("\r\n") if keep_source else None)
+            continue
+        if key == END_KEY:
+            if layout is not None and keep_source:
+                layout.ending = [x.rstrip("\r\n") for x in [header] + body]
+            continue
+        block_class = registry.get(key)
+        block = section_block(block_class, key, header, body, processes, keep_source)
+        yield (load_case if block_class is None or block.is_load else None), block
+
+
+def iter_layout(sections, blocks, loads):
+    seen = set()
+    for scope, key in sections:
+        if key in (blocks if scope is None else loads.get(scope, ())):
+            seen.add((scope, key))
+            yield scope, key
+    for key in blocks:
+        if (None, key) not in seen:
+            yield None, key
+    for load_case, case_blocks in loads.items():
+        for key in case_blocks:
+            if (load_case, key) not in seen:
+                yield load_case, key
+
+
+def write_model(fileobj, entries, chunk_size=WRITE_CHUNK_LINES, case_headers=None,
+                preamble=(), ending=None):
+    case_headers = case_headers or {}
+    write_lines(fileobj, preamble, chunk_size)
+    current = None
+    for load_case, block in entries:
+        if load_case is not None and load_case != current:
+            write_lines(fileobj, [
+                case_headers.get(load_case) or "*{}, {}".format(LOAD_CASE_KEY, load_case)
+            ])
+            current = load_case
+        block.write_to(fileobj, chunk_size)
+    write_lines(fileobj, ["*" + END_KEY] if ending is None else ending, chunk_size)
+
+
+class Model(object):
+    def __init__(self, blocks=None, loads=None, sections=None):
+        self.blocks = OrderedDict() if blocks is None else blocks
+        self.loads = OrderedDict() if loads is None else loads
+        self.sections = [] if sections is None else sections
+        self.case_headers = {}
+        self.preamble = []
+        self.ending = None
+
+    def __repr__(self):
+        return "<Model:{}blocks {}load cases>".format(
+            len(self.blocks), len(self.loads)
+        )
+
+    def __contains__(self, key):
+        return key in self.blocks
+
+    def __iter__(self):
+        return iter(self.blocks.values())
+
+    def __getitem__(self, key):
+        return self.blocks[key]
+
+    def load_blocks(self, load_case):
+        return self.loads[load_case]
+
+    def add_load_case(self, load_case, header=None):
+        self.loads.setdefault(load_case, OrderedDict())
+        if header is not None:
+            self.case_headers[load_case] = header
+
+    def add_block(self, block, load_case=None):
+        scope = self.blocks
+        if load_case is not None:
+            scope = self.loads.setdefault(load_case, OrderedDict())
+        if block.key in scope:
+            merged = scope[block.key] + block
+            merged.source_header = scope[block.key].source_header
+            merged.trailer = list(scope[block.key].trailer) + list(block.trailer)
+            scope[block.key] = merged
+        else:
+            scope[block.key] = block
+            self.sections.append((load_case, block.key))
+
+    def write_to(self, fileobj, chunk_size=WRITE_CHUNK_LINES):
+        write_model(
+            fileobj,
+            (
+                (k, self.blocks[x] if k is None else self.loads[k][x])
+                for k, x in iter_layout(self.sections, self.blocks, self.loads)
+            ),
+            chunk_size,
+            self.case_headers,
+            self.preamble,
+            self.ending
+        )
+
+    @classmethod
+    def from_lines(cls, lines, registry=BLOCK_REGISTRY, processes=None, keep_source=False):
+        model = cls()
+        for load_case, block in iter_blocks(lines, registry, processes, keep_source, model):
+            model.add_block(block, load_case)
+        return model
+
+    @classmethod
+    def from_file(cls, path, registry=BLOCK_REGISTRY, processes=None, keep_source=False):
+        with open(path) as f:
+            return cls.from_lines(f, registry, processes, keep_source)
+
+
+class Lazy_model(object):
+    def __init__(
+        self,
+        path,
+        registry=BLOCK_REGISTRY,
+        encoding="utf-8",
+        processes=None,
+        keep_source=False,
+        cache=None
+    ):
+        self.registry = registry
+        self.encoding = encoding
+        self.processes = processes
+        self.keep_source = keep_source
+        self.cache = cache
+        self.blocks = OrderedDict()
+        self.loads = OrderedDict()
+        self.case_headers = {}
+        self.preamble = []
+        self.ending = None
+        self._load_cases = []
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index = self._build_index()
+
+    def __repr__(self):
+        return "<Lazy_model:{}/{}blocks parsed {}load cases>".format(
+            len(self.blocks), len(self.keys()), len(self.load_cases)
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, key):
+        return (None, key) in self.index
+
+    def __iter__(self):
+        return (self[x] for x in self.keys())
+
+    def __getitem__(self, key):
+        if key not in self.blocks:
+            self.blocks[key] = self._parse(key, self.index[(None, key)])
+        return self.blocks[key]
+
+    def _peek(self, scope, key):
+        cache = self.blocks if scope is None else self.loads.get(scope, {})
+        if key in cache:
+            return cache[key]
+        return self._parse(key, self.index[(scope, key)])
+
+    def _decode(self, data):
+        return data if isinstance(data, str) else data.decode(self.encoding)
+
+    def _build_index(self):
+        index = OrderedDict()
+        load_case = None
+        headers = find_headers(self._map)
+        ends = [x[0] for x in headers[1:]] + [len(self._map)]
+        if self.keep_source and headers:
+            self.preamble = self._decode(self._map[:headers[0][0]]).splitlines()
+        for (start, header_end), end in zip(headers, ends):
+            header = self._decode(self._map[start:header_end])
+            key, arg = split_header(strip_comment(header))
+            if key == LOAD_CASE_KEY:
+                load_case = arg
+                self._load_cases.append(load_case)
+                self.case_headers[load_case] = header.rstrip("\r\n")
+                continue
+            if key == END_KEY:
+                self.ending = self._decode(self._map[start:]).splitlines()
+                break
+            block_class = self.registry.get(key)
+            scope = load_case if block_class is None or block_class.is_load else None
+            index.setdefault((scope, key), []).append((start, header_end, end))
+        if not self.keep_source:
+            self.case_headers = {}
+            self.ending = None
+        return index
+
+    def _parse_section(self, block_class, key, span):
+        start, header_end, end = span
+        return section_block(
+            block_class,
+            key,
+            self._decode(self._map[start:header_end]),
+            self._decode(self._map[header_end:end]).splitlines()[1:],
+            self.processes,
+            self.keep_source
+        )
+
+    def _parse(self, key, spans):
+        block_class = self.registry.get(key)
+        if self.cache is None or block_class is None:
+            blocks = [self._parse_section(block_class, key, x) for x in spans]
+        else:
+            blocks = [
+                self.cache.fetch(
+                    block_class,
+                    self._map[x[0]:x[2]],
+                    lambda x=x: self._parse_section(block_class, key, x),
+                    (self.encoding, self.keep_source)
+                ) for x in spans
+            ]
+        return reduce(lambda a, b: a + b, blocks)
+
+    @property
+    def load_cases(self):
+        return list(OrderedDict.fromkeys(self._load_cases))
+
+    @property
+    def sections(self):
+        return list(self.index)
+
+    def keys(self):
+        return [k for scope, k in self.index if scope is None]
+
+    def load_blocks(self, load_case):
+        if load_case not in self.loads:
+            self.loads[load_case] = OrderedDict(
+                (k, self._parse(k, spans))
+                for (scope, k), spans in self.index.items() if scope == load_case
+            )
+        return self.loads[load_case]
+
+    def case_keys(self, load_case):
+        return [k for scope, k in self.index if scope == load_case]
+
+    def write_to(self, fileobj, chunk_size=WRITE_CHUNK_LINES):
+        write_model(
+            fileobj,
+            ((scope, self._peek(scope, k)) for scope, k in self.index),
+            chunk_size,
+            self.case_headers,
+            self.preamble,
+            self.ending
+        )
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+if __name__ == "__main__":
+    lines = [
+        "*VERSION",
+        "   8.8.1",
+        "*UNIT    ; Unit System",
+        "; FORCE, LENGTH, HEAT, TEMPER",
+        "KN, M, KJ, C",
+        "",
+        "*NODE    ; Nodes",
+        "; iNO, X, Y, Z",
+        "3, 4.0, 0.0, 3.0",
+        "1, 0.0, 0.0, 0.0",
+        "2, 0.0, 0.0, 3.0",
+        "*ELEMENT    ; Elements",
+        "1, BEAM, 1, 1, 1, 2, 0, 0",
+        "2, BEAM, 1, 1, 2, 3, 0, 0",
+        "*GROUP    ; Group",
+        "; NAME, NODE_LIST, ELEM_LIST, PLANE_TYPE",
+        "   COLUMN, 1 2, 1, 0",
+        "*STLDCASE    ; Static Load Cases",
+        "; LCNAME, LCTYPE, DESC",
+        "   DL, D, ",
+        "   LL, L, ",
+        "*USE-STLD, DL",
+        "*CONLOAD    ; Nodal Loads",
+        "2, 0, 0, -10, 0, 0, 0, ",
+        "*USE-STLD, LL",
+        "*CONLOAD    ; Nodal Loads",
+        "3, 0, 0, -5, 0, 0, 0, ",
+        "",
+        "*LOADCOMB    ; Combinations",
+        "NAME=LCB1, GEN, ACTIVE, 0, 0, , 0, 0",
+        "ST, DL, 1.2, ST, LL, 1.6",
+        "*ENDDATA"
+    ]
+    model = Model.from_lines(lines)
+    print(model)
+    print(model["NODE"].to_lines())
+    print(model["ELEMENT"].to_lines())
+    print(model["GROUP"].to_lines())
+    print(model.load_blocks("DL")["CONLOAD"].to_lines())
+    print(model.load_blocks("LL")["CONLOAD"].to_lines())
+    model.write_to(sys.stdout)
+
+    verbatim = Model.from_lines(lines, keep_source=True)
+    with tempfile.TemporaryFile("w+") as output:
+        verbatim.write_to(output)
+        output.seek(0)
+        assert output.read().splitlines() == lines
+    verbatim["NODE"][3].update(z=6.0)
+    verbatim.write_to(sys.stdout)
@@ -0,0 +1,166 @@
+from itertools import product
+
+import numpy as np
+
+from columnar import node_arrays
+
+NODES_PER_CELL = 2
+
+
+def estimate_cell_size(coordinates, nodes_per_cell=NODES_PER_CELL):
+    if len(coordinates) < 2:
+        return 1.0
+    extent = np.ptp(coordinates, axis=0)
+    extent = extent[extent > 0]
+    if not len(extent):
+        return 1.0
+    volume = np.prod(extent) * nodes_per_cell / len(coordinates)
+    return float(volume ** (1.0 / len(extent)))
+
+
+class Node_grid(object):
+    def __init__(self, ids=(), coordinates=(), cell_size=None):
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)
+        self.cell_size = float(cell_size or estimate_cell_size(coordinates))
+        self.cells = {}
+        self.points = {}
+        self.node_cells = {}
+        self.lower = None
+        self.upper = None
+        self.update(ids, coordinates)
+
+    def __repr__(self):
+        return "<Node_grid:{}nodes {}cells size={}>".format(
+            len(self.points), len(self.cells), self.cell_size
+        )
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, node_id):
+        return int(node_id) in self.points
+
+    def cell_of(self, coordinate):
+        return tuple([
+            int(x) for x in np.floor(np.asarray(coordinate, dtype=np.float64) / self.cell_size)
+        ])
+
+    def update(self, ids, coordinates):
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)
+        if not len(ids):
+            return
+        keys = np.floor(coordinates / self.cell_size).astype(np.int64)
+        lower, upper = keys.min(axis=0), keys.max(axis=0)
+        self.lower = lower if self.lower is None else np.minimum(self.lower, lower)
+        self.upper = upper if self.upper is None else np.maximum(self.upper, upper)
+        for node_id, key, xyz in zip(ids.tolist(), keys.tolist(), coordinates.tolist()):
+            key = tuple(key)
+            old = self.node_cells.get(node_id)
+            if old != key:
+                if old is not None:
+                    self._discard(node_id, old)
+                self.cells.setdefault(key, set()).add(node_id)
+                self.node_cells[node_id] = key
+            self.points[node_id] = xyz
+
+    def insert(self, node_id, coordinate):
+        self.update([int(node_id)], [coordinate])
+
+    def remove(self, node_id):
+        node_id = int(node_id)
+        self._discard(node_id, self.node_cells.pop(node_id))
+        del self.points[node_id]
+
+    def _discard(self, node_id, key):
+        cell = self.cells[key]
+        cell.discard(node_id)
+        if not cell:
+            del self.cells[key]
+
+    def _candidates(self, lower, upper):
+        spans = [max(u - l + 1, 0) for l, u in zip(lower, upper)]
+        if np.prod(spans) > len(self.cells):
+            cells = [
+                v for k, v in self.cells.items()
+                if all(l <= x <= u for x, l, u in zip(k, lower, upper))
+            ]
+        else:
+            cells = [
+                self.cells[k] for k in product(*[range(l, u + 1) for l, u in zip(lower, upper)])
+                if k in self.cells
+            ]
+        ids = np.array([x for cell in cells for x in cell], dtype=np.int64)
+        coordinates = np.array([self.points[x] for x in ids.tolist()], dtype=np.float64)
+        return ids, coordinates.reshape(-1, 3)
+
+    def box(self, lower, upper):
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        ids, coordinates = self._candidates(self.cell_of(lower), self.cell_of(upper))
+        inside = ((coordinates >= lower) & (coordinates <= upper)).all(axis=1)
+        return sorted(ids[inside].tolist())
+
+    def radius(self, point, radius):
+        point = np.asarray(point, dtype=np.float64)
+        ids, coordinates = self._candidates(
+            self.cell_of(point - radius), self.cell_of(point + radius)
+        )
+        distances = np.sqrt(((coordinates - point) ** 2).sum(axis=1))
+        inside = distances <= radius
+        ids, distances = ids[inside], distances[inside]
+        return ids[np.lexsort((ids, distances))].tolist()
+
+    def k_nearest(self, point, k=1):
+        if not self.points:
+            return []
+        k = min(k, len(self.points))
+        point = np.asarray(point, dtype=np.float64)
+        center = np.array(self.cell_of(point))
+        max_ring = int(np.maximum(np.abs(self.lower - center), np.abs(self.upper - center)).max())
+        ring = 1
+        while True:
+            ids, coordinates = self._candidates(
+                (center - ring).tolist(), (center + ring).tolist()
+            )
+            distances = np.sqrt(((coordinates - point) ** 2).sum(axis=1))
+            if len(ids) >= k:
+                order = np.lexsort((ids, distances))[:k]
+                if distances[order[-1]] <= ring * self.cell_size or ring >= max_ring:
+                    return ids[order].tolist()
+            ring = min(ring * 2, max(max_ring, 1))
+
+    def nearest(self, point):
+        ids = self.k_nearest(point, 1)
+        return ids[0] if ids else None
+
+    def coincident(self, point, tolerance=1e-6):
+        return self.radius(point, tolerance)
+
+    def update_nodes(self, nodes):
+        self.update(*node_arrays(nodes))
+
+    @classmethod
+    def from_nodes(cls, nodes, cell_size=None):
+        ids, coordinates = node_arrays(nodes)
+        return cls(ids, coordinates, cell_size)
+
+
+if __name__ == "__main__":
+    from columnar import Columnar_nodes
+
+    nodes = Columnar_nodes(
+        range(1, 1001),
+        [(x, y, z) for x in range(10) for y in range(10) for z in range(10)]
+    )
+    grid = Node_grid.from_nodes(nodes)
+    print(grid)
+    print(grid.nearest((2.2, 3.1, 4.4)))
+    print(grid.k_nearest((0.0, 0.0, 0.0), 4))
+    print(grid.radius((5.0, 5.0, 5.0), 1.0))
+    print(grid.box((0.0, 0.0, 0.0), (1.0, 1.0, 0.0)))
+    grid.insert(1001, (5.0, 5.0, 5.0))
+    print(grid.coincident((5.0, 5.0, 5.0)))
+    grid.insert(1001, (50.0, 50.0, 50.0))
+    print(grid.nearest((40.0, 40.0, 40.0)))
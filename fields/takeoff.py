@@ -0,0 +1,230 @@
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+from blocks import Block_base
+from columnar import Sorted_index, Columnar_thicknesses, columnar_elements
+from geometry import Element_geometry
+from loads import resultant
+
+GRAVITY = 9.80665
+DB_WEIGHT_DENSITIES = {"STEEL": 76.98, "CONC": 23.56}
+FORCE_FACTORS = {"KN": 1.0, "N": 1000.0}
+LENGTH_FACTORS = {"M": 1.0, "MM": 1000.0}
+DB_DIMENSION_UNIT = "MM"
+SELFWEIGHT_KEY = "SELFWEIGHT"
+DIMENSION_NUM = 10
+FLANGE_SHAPES = ("H", "C", "T", "L", "B")
+
+
+def flange_area(d):
+    height, width, web, flange, width2, flange2 = d[:6]
+    width2, flange2 = width2 or width, flange2 or flange
+    return width * flange + width2 * flange2 + (height - flange - flange2) * web
+
+
+def box_area(d):
+    height, width, web, flange, _, flange2 = d[:6]
+    flange2 = flange2 or flange
+    return width * (flange + flange2) + 2 * web * (height - flange - flange2)
+
+
+def pipe_area(d):
+    return np.pi / 4 * (d[0] ** 2 - (d[0] - 2 * d[1]) ** 2)
+
+
+SHAPE_AREAS = {
+    "H": flange_area,
+    "C": flange_area,
+    "T": lambda d: d[1] * d[3] + (d[0] - d[3]) * d[2],
+    "L": lambda d: d[0] * d[2] + (d[1] - d[2]) * d[3],
+    "B": box_area,
+    "P": pipe_area,
+    "SB": lambda d: d[0] * d[1],
+    "SR": lambda d: np.pi / 4 * d[0] ** 2
+}
+
+
+def unit_factors(unit=None):
+    if unit is None:
+        return 1.0, 1.0
+    return FORCE_FACTORS[str(unit.force)], LENGTH_FACTORS[str(unit.length)]
+
+
+def section_dimensions(section, section_scale=1.0, db_scale=1.0):
+    dims = [float(getattr(section, "d{}".format(i), 0.0)) for i in range(1, DIMENSION_NUM + 1)]
+    if any(dims):
+        return tuple([x * section_scale for x in dims])
+    name = str(getattr(section, "sname", section.name))
+    dims = [float(x) * db_scale for x in re.findall(r"\d+(?:\.\d+)?", name)]
+    if len(dims) == 3 and str(section.shape) in FLANGE_SHAPES:
+        dims.append(dims[2])
+    return tuple(dims)
+
+
+def section_area(shape, dims):
+    if shape not in SHAPE_AREAS:
+        raise ValueError("Not supported section shape: {}".format(shape))
+    padded = list(dims) + [0.0] * (DIMENSION_NUM - len(dims))
+    return float(SHAPE_AREAS[shape](padded))
+
+
+def block_items(block):
+    if isinstance(block, Block_base):
+        return list(block.items.values()) if isinstance(block.items, dict) else block.items
+    return list(block)
+
+
+def material_densities(material, force_factor=1.0, length_factor=1.0):
+    gravity = GRAVITY * length_factor
+    if hasattr(material, "density"):
+        weight = float(material.density)
+        return weight, float(getattr(material, "mass", 0.0)) or weight / gravity
+    weight = DB_WEIGHT_DENSITIES.get(str(getattr(material, "type", "")), 0.0)
+    weight *= force_factor / length_factor ** 3
+    return weight, weight / gravity
+
+
+def material_arrays(materials, force_factor=1.0, length_factor=1.0):
+    items = block_items(materials)
+    densities = np.array([
+        material_densities(x, force_factor, length_factor) for x in items
+    ], dtype=np.float64)
+    return np.array([int(x.id) for x in items], dtype=np.int64), densities.reshape(-1, 2)
+
+
+def section_arrays(sections, section_scale=1.0, length_factor=1.0):
+    items = block_items(sections)
+    db_scale = length_factor / LENGTH_FACTORS[DB_DIMENSION_UNIT]
+    keys = [(str(x.shape), section_dimensions(x, section_scale, db_scale)) for x in items]
+    areas = {}
+    for key in keys:
+        if key not in areas:
+            areas[key] = section_area(*key)
+    return (
+        np.array([int(x.id) for x in items], dtype=np.int64),
+        np.array([areas[x] for x in keys], dtype=np.float64)
+    )
+
+
+def thickness_arrays(thicknesses):
+    if isinstance(thicknesses, Columnar_thicknesses):
+        return thicknesses.ids, thicknesses.column("thick_in")
+    items = block_items(thicknesses)
+    return (
+        np.array([int(x.id) for x in items], dtype=np.int64),
+        np.array([x.thick_in for x in items], dtype=np.float64)
+    )
+
+
+def lookup(ids, values, keys):
+    return values[Sorted_index(ids).positions(keys)] if len(keys) else values[:0]
+
+
+class Take_off(object):
+    def __init__(self, nodes, elements, materials=(), sections=(), thicknesses=(),
+                 section_scale=1.0, unit=None):
+        elements = columnar_elements(elements)
+        geometry = Element_geometry(nodes, elements)
+        lines, plates = elements.lines, elements.plates
+        force_factor, length_factor = unit_factors(unit)
+        material_ids, densities = material_arrays(materials, force_factor, length_factor)
+        section_ids, areas = section_arrays(sections, section_scale, length_factor)
+        self.element_ids = np.concatenate([lines.ids, plates.ids])
+        self.material_ids = np.concatenate([lines.imats, plates.imats])
+        self.volumes = np.concatenate([
+            geometry.lengths * lookup(section_ids, areas, lines.isects),
+            geometry.areas * lookup(*thickness_arrays(thicknesses), keys=plates.isects)
+        ])
+        weight_density, mass_density = lookup(material_ids, densities, self.material_ids).T
+        self.weights = self.volumes * weight_density
+        self.masses = self.volumes * mass_density
+        self.centroids = np.concatenate([geometry.midpoints, geometry.centroids])
+
+    def __repr__(self):
+        return "<Take_off:{}elements {:.3f}mass>".format(len(self.element_ids), self.total_mass)
+
+    def __len__(self):
+        return len(self.element_ids)
+
+    @property
+    def total_mass(self):
+        return float(self.masses.sum())
+
+    @property
+    def total_weight(self):
+        return float(self.weights.sum())
+
+    def mass_of(self, element_ids):
+        return self.masses[Sorted_index(self.element_ids).positions(element_ids)]
+
+    def material_masses(self):
+        ids, inverse = np.unique(self.material_ids, return_inverse=True)
+        return OrderedDict(zip(ids.tolist(), np.bincount(inverse, weights=self.masses).tolist()))
+
+    def selfweight(self, factors=(0.0, 0.0, -1.0), point=(0.0, 0.0, 0.0)):
+        forces = self.weights[:, None] * np.asarray(factors, dtype=np.float64)
+        values = np.hstack([forces, np.zeros_like(forces)])
+        return resultant(self.centroids, np.arange(len(self)), values, point)
+
+    def selfweights(self, load_cases, point=(0.0, 0.0, 0.0)):
+        return OrderedDict(
+            (k, self.selfweight((x.x, x.y, x.z), point))
+            for k, v in load_cases.items() if SELFWEIGHT_KEY in v
+            for x in v[SELFWEIGHT_KEY].items
+        )
+
+    @classmethod
+    def from_model(cls, model, section_scale=1.0):
+        return cls(
+            model["NODE"],
+            model["ELEMENT"],
+            model["MATERIAL"] if "MATERIAL" in model else (),
+            model["SECTION"] if "SECTION" in model else (),
+            model["THICKNESS"] if "THICKNESS" in model else (),
+            section_scale,
+            model["UNIT"].items[0] if "UNIT" in model else None
+        )
+
+
+if __name__ == "__main__":
+    from models import Model
+
+    model = Model.from_lines([
+        "*UNIT",
+        "KN, M, KJ, C",
+        "*NODE",
+        "1, 0.0, 0.0, 0.0",
+        "2, 0.0, 0.0, 4.0",
+        "3, 6.0, 0.0, 4.0",
+        "4, 6.0, 5.0, 4.0",
+        "5, 0.0, 5.0, 4.0",
+        "*ELEMENT",
+        "1, BEAM, 1, 1, 1, 2, 0, 0",
+        "2, BEAM, 1, 3, 2, 3, 0, 0",
+        "4, BEAM, 3, 4, 3, 4, 0, 0",
+        "5, BEAM, 4, 4, 4, 5, 0, 0",
+        "3, PLATE, 2, 1, 2, 3, 4, 5, 1, 0, ",
+        "*MATERIAL",
+        "1,  STEEL, STKN490,0,0,,C,NO,0.02,1,JIS(S),,STKN490, NO,205",
+        "2, CONC, Fc24, 0, 0, , C, NO, 0.05, 2, 22700, 0.2, 0.00001, 24, 0",
+        "3, STEEL, SS400, 0, 0, , C, YES, 0.02, 2, 205000, 0.3, 0.000012, 77, 7.85",
+        "4, USER, WOOD, 0, 0, , C, NO, 0.05, 3, 10000, 500, 500, 0.000005, 0.00003, 0.00003, "
+        "600, 600, 60, 0.4, 0.4, 0.4, 4.0",
+        "*SECTION",
+        "1, DBUSER, P 318.5x12.7, CC, 0, 0, 0, 0, 0, 0, YES, NO, P, 2, 0.3185, 0.0127, 0, 0, 0, 0, 0, 0, 0, 0",
+        "3, DBUSER, H 800x300x14/26, CC, 0, 0, 0, 0, 0, 0, YES, NO, H, 1, JIS, H 800x300x14/26",
+        "4, DBUSER, L 100x100x10, CC, 0, 0, 0, 0, 0, 0, YES, NO, L, 1, JIS, L 100x100x10",
+        "*THICKNESS",
+        "1, VALUE, YES, 0.15, 0, NO, 0, 0",
+        "*USE-STLD, DL",
+        "*SELFWEIGHT",
+        "0, 0, -1, "
+    ])
+    take_off = Take_off.from_model(model)
+    print(take_off)
+    print(sorted(zip(take_off.element_ids.tolist(), take_off.masses.tolist())))
+    print(take_off.material_masses())
+    print(take_off.total_weight)
+    print(take_off.selfweights(model.loads))
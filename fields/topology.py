@@ -0,0 +1,110 @@
+import numpy as np
+
+from columnar import element_arrays
+
+
+def as_connectivity(element_ids, nodes):
+    element_ids = np.asarray(element_ids, dtype=np.int64).reshape(-1)
+    nodes = np.asarray(nodes, dtype=np.int64)
+    if not len(element_ids):
+        return element_ids, nodes.reshape(0, nodes.shape[-1] if nodes.ndim == 2 else 0)
+    return element_ids, nodes.reshape(len(element_ids), -1)
+
+
+class Node_adjacency(object):
+    def __init__(self, element_ids=(), nodes=()):
+        self.element_ids, self.nodes = as_connectivity(element_ids, nodes)
+        self.build()
+
+    def __repr__(self):
+        return "<Node_adjacency:{}nodes {}elements>".format(
+            len(self.node_ids), len(self.element_ids)
+        )
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __contains__(self, node_id):
+        return self._position(node_id) is not None
+
+    def __getitem__(self, node_id):
+        return self.elements_of(node_id)
+
+    def build(self):
+        width = self.nodes.shape[1]
+        rows = np.repeat(np.arange(len(self.element_ids)), width)
+        flat = self.nodes.reshape(-1)
+        used = flat > 0
+        count = max(len(self.element_ids), 1)
+        keys = np.sort(flat[used] * count + rows[used])
+        sorted_nodes = keys // count
+        starts = np.flatnonzero(np.append(True, sorted_nodes[1:] != sorted_nodes[:-1]))
+        starts = starts[:len(sorted_nodes)]
+        self.node_ids = sorted_nodes[starts]
+        self.offsets = np.append(starts, len(sorted_nodes)).astype(np.int64)
+        self.indices = keys % count
+
+    def _position(self, node_id):
+        pos = np.searchsorted(self.node_ids, int(node_id))
+        if pos < len(self.node_ids) and self.node_ids[pos] == int(node_id):
+            return pos
+        return None
+
+    def positions_of(self, node_id):
+        pos = self._position(node_id)
+        if pos is None:
+            return self.indices[:0]
+        return self.indices[self.offsets[pos]:self.offsets[pos + 1]]
+
+    def elements_of(self, node_id):
+        return self.element_ids[self.positions_of(node_id)]
+
+    def degrees(self):
+        return np.diff(self.offsets)
+
+    def unused(self, node_ids):
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        return node_ids[~np.in1d(node_ids, self.node_ids)]
+
+    def add(self, element_ids, nodes):
+        element_ids, nodes = as_connectivity(element_ids, nodes)
+        width = max(self.nodes.shape[1], nodes.shape[1])
+        keep = ~np.in1d(self.element_ids, element_ids)
+        self.element_ids = np.concatenate([self.element_ids[keep], element_ids])
+        self.nodes = np.concatenate([
+            np.pad(self.nodes[keep], ((0, 0), (0, width - self.nodes.shape[1])), "constant"),
+            np.pad(nodes, ((0, 0), (0, width - nodes.shape[1])), "constant")
+        ])
+        self.build()
+
+    def remove(self, element_ids):
+        keep = ~np.in1d(self.element_ids, np.asarray(element_ids, dtype=np.int64))
+        self.element_ids = self.element_ids[keep]
+        self.nodes = self.nodes[keep]
+        self.build()
+
+    def add_elements(self, elements):
+        self.add(*element_arrays(elements))
+
+    @classmethod
+    def from_elements(cls, elements):
+        return cls(*element_arrays(elements))
+
+
+if __name__ == "__main__":
+    from columnar import Columnar_elements
+
+    elements = Columnar_elements.from_lines([
+        "1, BEAM, 1, 1, 1, 2, 0, 0",
+        "2, BEAM, 1, 1, 2, 3, 0, 0",
+        "3, PLATE, 1, 1, 1, 2, 5, 4, 1, 0, ",
+        "4, PLATE, 1, 1, 2, 3, 5, 0, 1, 0, "
+    ])
+    adjacency = Node_adjacency.from_elements(elements)
+    print(adjacency)
+    print(adjacency.node_ids, adjacency.offsets, adjacency.indices)
+    print(adjacency[2], adjacency[5], adjacency[9])
+    print(adjacency.unused([1, 6, 7]))
+    adjacency.add([5], [[6, 7]])
+    adjacency.remove([1])
+    print(adjacency[1], adjacency[6], adjacency.degrees())
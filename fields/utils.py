@@ -1,8 +1,9 @@
-from itertools import count, groupby
+from itertools import chain, count, groupby
 
-
-def calc_diff_counter(n, c=count()):
-        return n - next(c)
+try:
+    xrange
+except NameError:
+    xrange = range
 
 
 def count_bool(b, c=count()):
@@ -71,15 +72,177 @@ def grouping_values_by_discrete_index_flag(values, f_bool):
 
 
 def grouping_continuous_int(values):
-        sorted_values = sorted(values)
-        counted = [calc_diff_counter(x) for x in sorted_values]
-        key_func = lambda x: x[1]
-        grouped = [
-            [
-                x[0] for x in list(g)
-            ] for _, g in groupby(
-                zip(sorted_values, counted),
-                key=key_func
-            )
-        ]
-        return grouped
+    sorted_values = sorted(values)
+    key_func = lambda x: x[1] - x[0]
+    grouped = [
+        [
+            x[1] for x in list(g)
+        ] for _, g in groupby(
+            enumerate(sorted_values),
+            key=key_func
+        )
+    ]
+    return grouped
+
+
+def encode_runs(sorted_ids):
+    runs = []
+    start = end = step = None
+    for x in sorted_ids:
+        if start is None:
+            start = end = x
+        elif x == end:
+            continue
+        elif end == start:
+            end, step = x, x - start
+        elif x - end == step:
+            end = x
+        elif end - start == step:
+            runs.append((start, start, 1))
+            start, end, step = end, x, x - end
+        else:
+            runs.append((start, end, step))
+            start = end = x
+    if start is not None:
+        runs.append((start, end, step if end != start else 1))
+    return runs
+
+
+def run_count(run):
+    return (run[1] - run[0]) // run[2] + 1
+
+
+def run_ids(run):
+    return xrange(run[0], run[1] + 1, run[2])
+
+
+def canonical_run(start, end, step=1):
+    if step < 1 or end < start:
+        raise ValueError("{}to{}by{} is not valid id range.".format(start, end, step))
+    end = start + (end - start) // step * step
+    return start, end, step if end != start else 1
+
+
+def contains_run(run, other):
+    return (
+        run[0] <= other[0] and
+        other[1] <= run[1] and
+        (other[0] - run[0]) % run[2] == 0 and
+        (other[0] == other[1] or other[2] % run[2] == 0)
+    )
+
+
+def append_run(runs, run):
+    if runs:
+        start, end, step = runs[-1]
+        is_unit = (start == end or step == 1) and (run[0] == run[1] or run[2] == 1)
+        if is_unit and run[0] == end + 1:
+            runs[-1] = (start, run[1], 1)
+            return
+        if start != end and step == run[2] and run[0] == end + step:
+            runs[-1] = (start, run[1], step)
+            return
+    runs.append(run)
+
+
+def merge_run_cluster(cluster):
+    if len(cluster) == 1:
+        return cluster
+    if all(x[2] == 1 for x in cluster):
+        return [(cluster[0][0], max(x[1] for x in cluster), 1)]
+    widest = max(cluster, key=run_count)
+    if all(contains_run(widest, x) for x in cluster):
+        return [widest]
+    ids = set(chain.from_iterable(run_ids(x) for x in cluster))
+    return encode_runs(sorted(ids))
+
+
+def normalize_runs(runs):
+    normalized = []
+    cluster = []
+    cluster_end = None
+    for run in sorted(canonical_run(*x) for x in runs):
+        if cluster and run[0] > cluster_end:
+            for x in merge_run_cluster(cluster):
+                append_run(normalized, x)
+            cluster = []
+        if not cluster:
+            cluster_end = run[1]
+        cluster.append(run)
+        cluster_end = max(cluster_end, run[1])
+    for x in merge_run_cluster(cluster) if cluster else ():
+        append_run(normalized, x)
+    return normalized
+
+
+def extended_gcd(a, b):
+    if b == 0:
+        return a, 1, 0
+    g, x, y = extended_gcd(b, a % b)
+    return g, y, x - (a // b) * y
+
+
+def intersect_run(run, other):
+    low = max(run[0], other[0])
+    high = min(run[1], other[1])
+    if low > high:
+        return None
+    g, p, _ = extended_gcd(run[2], other[2])
+    if (other[0] - run[0]) % g:
+        return None
+    step = run[2] // g * other[2]
+    origin = run[0] + (other[0] - run[0]) // g * p * run[2]
+    first = low + (origin - low) % step
+    if first > high:
+        return None
+    return canonical_run(first, high, step)
+
+
+def subtract_run(run, other):
+    common = intersect_run(run, other)
+    if common is None:
+        return [run]
+    start, end, step = run
+    pieces = []
+    if common[0] > start:
+        pieces.append(canonical_run(start, common[0] - step, step))
+    if common[0] != common[1]:
+        upper = min(common[0] + common[2], common[1] + 1)
+        for offset in xrange(common[0] + step, upper, step):
+            pieces.append(canonical_run(offset, common[1], common[2]))
+    if common[1] < end:
+        pieces.append(canonical_run(common[1] + step, end, step))
+    return pieces
+
+
+def union_runs(runs, other):
+    return normalize_runs(chain(runs, other))
+
+
+def intersect_runs(runs, other):
+    intersected = []
+    i = j = 0
+    while i < len(runs) and j < len(other):
+        common = intersect_run(runs[i], other[j])
+        if common is not None:
+            intersected.append(common)
+        if runs[i][1] < other[j][1]:
+            i += 1
+        else:
+            j += 1
+    return normalize_runs(intersected)
+
+
+def subtract_runs(runs, other):
+    subtracted = []
+    j = 0
+    for run in runs:
+        while j < len(other) and other[j][1] < run[0]:
+            j += 1
+        pieces = [run]
+        k = j
+        while k < len(other) and other[k][0] <= run[1]:
+            pieces = list(chain.from_iterable(subtract_run(x, other[k]) for x in pieces))
+            k += 1
+        subtracted.extend(pieces)
+    return normalize_runs(subtracted)